@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: arena
+# Description: In-process self-play arena on top of host.GO.play
+# TodoList:
+
+import argparse
+import random
+import time
+
+from host import GO
+from random_player import RandomPlayer
+from endgame import EndgameSolver
+from my_player3 import MyGO, MyPlayer
+from mcts import MCTSPlayer
+from record import GameRecord, RecordWriter
+
+
+class TimedPlayer:
+    def __init__(self, player):
+        '''
+        Wrap a player to record the latency of every move it makes.
+
+        :param player: Player instance with get_input(go, piece_type).
+        '''
+        self.player = player
+        self.type = player.type
+        self.latencies = []
+
+    def get_input(self, go, piece_type):
+        start = time.perf_counter()
+        action = self.player.get_input(go, piece_type)
+        self.latencies.append(time.perf_counter() - start)
+        return action
+
+
+def play_game(black, white, n=5, verbose=False, names=None, seed=None):
+    '''
+    Play one game between two players in this process.
+
+    :param black: Player instance playing 'X'.
+    :param white: Player instance playing 'O'.
+    :param n: size of the board n*n
+    :param verbose: boolean, print the board after every move.
+    :param names: (Black name, White name) in the game record, the class names of the players by default.
+    :param seed: seed the game was played with, kept in the game record.
+    :return: dict with the winner (0 if it's a tie), the number of moves, the move latencies of each player
+             and the GameRecord of the game.
+    '''
+    go = GO(n)
+    go.verbose = verbose
+    timed_black = TimedPlayer(black)
+    timed_white = TimedPlayer(white)
+    if names is None:
+        names = (type(black).__name__, type(white).__name__)
+    record = GameRecord(names[0], names[1], seed, n)
+    winner = go.play(timed_black, timed_white, verbose, record)
+    return {
+        'winner': winner,
+        'moves': go.n_move,
+        'latencies': {1: timed_black.latencies, 2: timed_white.latencies},
+        'record': record,
+    }
+
+
+def run_arena(agent, opponent, play_time=20, n=5, seed=None, verbose=False, log=print, recorder=None):
+    '''
+    Play games between an agent and an opponent, alternating colours like build.sh.
+
+    Odd rounds give Black to the opponent, even rounds give Black to the agent.
+
+    :param agent: Player instance being evaluated ("You" in build.sh).
+    :param opponent: Player instance to play against ("TA" in build.sh).
+    :param play_time: number of games.
+    :param n: size of the board n*n
+    :param seed: seed of the random module, None leaves it unseeded.
+    :param verbose: boolean, print the board after every move.
+    :param log: function called with each progress line, None prints nothing.
+    :param recorder: RecordWriter every game is written to, None records nothing.
+    :return: dict of results, see summarize().
+    '''
+    if seed is not None:
+        random.seed(seed)
+    results = {'black': [0, 0, 0], 'white': [0, 0, 0], 'moves': [], 'latencies': []}  # [win, lose, tie]
+    for round in range(1, play_time + 1):
+        agent_type = 2 if round % 2 else 1
+        if log:
+            log("=====Round {}=====".format(round))
+            log("Black:TA White:You" if agent_type == 2 else "Black:You White:TA")
+        if agent_type == 2:
+            game = play_game(opponent, agent, n, verbose)
+        else:
+            game = play_game(agent, opponent, n, verbose)
+        if recorder is not None:
+            recorder.write(game['record'])
+        winner = game['winner']
+        colour = 'White' if agent_type == 2 else 'Black'
+        record = results[colour.lower()]
+        if winner == agent_type:
+            record[0] += 1
+            message = '{}(You) win!'.format(colour)
+        elif winner == 0:
+            record[2] += 1
+            message = 'Tie.'
+        else:
+            record[1] += 1
+            message = '{}(You) lose.'.format(colour)
+        if log:
+            log(message)
+        results['moves'].append(game['moves'])
+        results['latencies'].extend(game['latencies'][agent_type])
+    return results
+
+
+def summarize(results):
+    '''
+    Summary lines in the format of build.sh.
+
+    :param results: dict returned by run_arena().
+    :return: a list of lines.
+    '''
+    black_win, black_lose, black_tie = results['black']
+    white_win, white_lose, white_tie = results['white']
+    lines = ["=====Summary=====",
+             "You play as Black Player | Win: {} | Lose: {} | Tie: {}".format(black_win, black_lose, black_tie),
+             "You play as White Player | Win: {} | Lose: {} | Tie: {}".format(white_win, white_lose, white_tie)]
+    latencies = results['latencies']
+    moves = results['moves']
+    if moves:
+        lines.append("Moves per game | Mean: {:.1f} | Max: {}".format(sum(moves) / len(moves), max(moves)))
+    if latencies:
+        lines.append("Your move latency | Mean: {:.4f}s | Max: {:.4f}s".format(
+            sum(latencies) / len(latencies), max(latencies)))
+    return lines
+
+
+def make_player(name, time_limit=None, depth=None, playouts=None, batch=1, endgame=None):
+    '''
+    Build a player from its command line name.
+
+    :param name: "random", "my" or "mcts".
+    :param time_limit: seconds per move for MyPlayer and MCTSPlayer.
+    :param depth: max depth for MyPlayer.
+    :param playouts: playouts per move for MCTSPlayer.
+    :param batch: playouts per expanded node for MCTSPlayer, run on NumPy arrays when above 1.
+    :param endgame: moves left from which MyPlayer solves the game exactly, None to never solve.
+    :return: Player instance.
+    '''
+    if name == "random":
+        return RandomPlayer()
+    if name == "my":
+        solver = None
+        if endgame is not None:
+            solver = EndgameSolver(MyGO(5), moves=endgame)
+        return MyPlayer(depth=depth or 24, time_limit=time_limit, endgame=solver)
+    if name == "mcts":
+        if time_limit is None and playouts is None:
+            time_limit = 1.0
+        # Seeded from the random module, which tournament.run_game seeds per game, so its games replay
+        return MCTSPlayer(time_limit=time_limit, playouts=playouts, batch=batch, seed=random.getrandbits(32),
+                          vectorized=batch > 1)
+    raise ValueError("Unknown player {}".format(name))
+
+
+def parse_player(spec):
+    '''
+    Build a player from a configuration like "random", "my:time=0.5,endgame=10", "my:depth=4" or "mcts:playouts=500,batch=64".
+
+    :param spec: player name, optionally followed by ":key=value,key=value". "my" or "mcts" alone searches 1 second per move.
+    :return: Player instance.
+    '''
+    name, _, options = spec.partition(":")
+    kwargs = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        if key == "time":
+            kwargs['time_limit'] = float(value)
+        elif key == "depth":
+            kwargs['depth'] = int(value)
+        elif key == "playouts":
+            kwargs['playouts'] = int(value)
+        elif key == "batch":
+            kwargs['batch'] = int(value)
+        elif key == "endgame":
+            kwargs['endgame'] = int(value)
+        else:
+            raise ValueError("Unknown option {} in {}".format(key, spec))
+    if name in ("my", "mcts") and not kwargs:
+        kwargs['time_limit'] = 1.0
+    return make_player(name, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", "-g", type=int, help="number of games", default=20)
+    parser.add_argument("--agent", "-a", type=str, help="player evaluated: random, my or mcts", default="my")
+    parser.add_argument("--opponent", "-o", type=str, help="opponent: random, my or mcts", default="random")
+    parser.add_argument("--time", "-t", type=float, help="seconds per move for my and mcts", default=1.0)
+    parser.add_argument("--depth", type=int, help="max depth for my", default=None)
+    parser.add_argument("--seed", "-s", type=int, help="random seed", default=None)
+    parser.add_argument("--verbose", "-v", action="store_true", help="print every board")
+    parser.add_argument("--record", type=str, help="append the games to this game record file", default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)  # before the players, which draw their seeds from it
+    agent = make_player(args.agent, args.time, args.depth)
+    opponent = make_player(args.opponent, args.time, args.depth)
+    recorder = RecordWriter(args.record) if args.record else None
+    results = run_arena(agent, opponent, args.games, seed=args.seed, verbose=args.verbose, recorder=recorder)
+    if recorder is not None:
+        recorder.close()
+    for line in summarize(results):
+        print(line)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: batch
+# Description: NumPy engine advancing many 5x5 games one move per step
+# TodoList:
+
+import argparse
+import time
+
+import numpy as np
+
+
+def neighbours(mask):
+    '''
+    Points next to a set of points, for a batch of boards.
+
+    :param mask: bool array (..., n, n).
+    :return: bool array (..., n, n) of the orthogonal neighbors of the points, excluding the points.
+    '''
+    out = np.zeros_like(mask)
+    out[..., 1:, :] |= mask[..., :-1, :]
+    out[..., :-1, :] |= mask[..., 1:, :]
+    out[..., :, 1:] |= mask[..., :, :-1]
+    out[..., :, :-1] |= mask[..., :, 1:]
+    return out
+
+
+def alive(stones, empty):
+    '''
+    Flood fill liberties through groups: a stone is alive if its group touches an empty point.
+
+    :param stones: bool array (..., n, n) of the stones of one color.
+    :param empty: bool array (..., n, n) of the empty points.
+    :return: bool array (..., n, n) of the stones whose group has a liberty.
+    '''
+    reached = stones & neighbours(empty)
+    while True:
+        grown = stones & (reached | neighbours(reached))
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+
+def place(boards, previous_boards, points, piece_types):
+    '''
+    Place one stone on every board and remove the captured stones.
+
+    :param boards: int8 array (B, n, n), 0 for empty, 1 for 'X' and 2 for 'O'.
+    :param previous_boards: int8 array (B, n, n), boards before the opponent's last move (KO rule).
+    :param points: int array (B,) of flat point indexes.
+    :param piece_types: int8 array (B,) of the side placing the stone.
+    :return: (new boards, bool array (B,) of legal placements). Illegal placements leave garbage boards.
+    '''
+    count, n, _ = boards.shape
+    rows = np.arange(count)
+    flat = boards.reshape(count, n * n).copy()
+    occupied = flat[rows, points] != 0
+    flat[rows, points] = piece_types
+    new_boards = flat.reshape(count, n, n)
+
+    colour = piece_types[:, None, None]
+    empty = new_boards == 0
+    opponent = new_boards == 3 - colour
+    dead = opponent & ~alive(opponent, empty)
+    new_boards[dead] = 0
+
+    own = new_boards == colour
+    suicide = (own & ~alive(own, new_boards == 0)).any(axis=(1, 2))
+    ko = dead.any(axis=(1, 2)) & (new_boards == previous_boards).all(axis=(1, 2))
+    return new_boards, ~occupied & ~suicide & ~ko
+
+
+class BatchGO:
+    def __init__(self, n, batch, komi=None, max_move=None, seed=None):
+        '''
+        Many n*n games stored in NumPy arrays and advanced together, with the rules of host.GO.
+
+        :param n: size of the board n*n
+        :param batch: number of games.
+        :param komi: komi rule, n / 2 like host.GO by default.
+        :param max_move: the max movement of a game, n * n - 1 like host.GO by default.
+        :param seed: seed of the random moves.
+        '''
+        self.size = n
+        self.batch = batch
+        self.komi = n / 2 if komi is None else komi
+        self.max_move = n * n - 1 if max_move is None else max_move
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, board=None, previous_board=None, piece_type=1, n_move=0, passes=0):
+        '''
+        Start every game from the same position.
+
+        :param board: n*n board, empty by default.
+        :param previous_board: board before the last move, same as board by default.
+        :param piece_type: side to move.
+        :param n_move: number of moves already played.
+        :param passes: consecutive passes that led to the position.
+        :return: None.
+        '''
+        n = self.size
+        start = np.zeros((n, n), dtype=np.int8) if board is None else np.array(board, dtype=np.int8)
+        previous = start if previous_board is None else np.array(previous_board, dtype=np.int8)
+        self.boards = np.repeat(start[None], self.batch, axis=0)
+        self.previous_boards = np.repeat(previous[None], self.batch, axis=0)
+        self.piece_types = np.full(self.batch, piece_type, dtype=np.int8)
+        self.n_move = np.full(self.batch, n_move, dtype=np.int32)
+        self.passes = np.full(self.batch, passes, dtype=np.int8)
+        self.done = (self.n_move >= self.max_move) | (self.passes >= 2)
+
+    def legal_mask(self):
+        '''
+        Legal placements of the side to move in every game, trying all points at once.
+
+        :return: bool array (B, n * n).
+        '''
+        count, n = self.batch, self.size
+        cells = n * n
+        boards = np.repeat(self.boards, cells, axis=0)
+        previous = np.repeat(self.previous_boards, cells, axis=0)
+        points = np.tile(np.arange(cells), count)
+        piece_types = np.repeat(self.piece_types, cells)
+        _, legal = place(boards, previous, points, piece_types)
+        return legal.reshape(count, cells)
+
+    def eye_mask(self):
+        '''
+        Empty points whose neighbors are all stones of the side to move.
+
+        :return: bool array (B, n * n).
+        '''
+        own = self.boards == self.piece_types[:, None, None]
+        eyes = (self.boards == 0) & ~neighbours(~own)
+        return eyes.reshape(self.batch, -1)
+
+    def step(self, avoid_eyes=True):
+        '''
+        Play one uniformly random legal move in every unfinished game, or pass if there is none.
+
+        Instead of building legal_mask(), a random empty point is tried in every game and the
+        games where it was illegal draw again among the points left, so only the drawn points
+        are checked.
+
+        :param avoid_eyes: boolean, never fill one's own eyes.
+        :return: None.
+        '''
+        active = ~self.done
+        count = self.batch
+        candidates = (self.boards == 0).reshape(count, -1) & active[:, None]
+        if avoid_eyes:
+            candidates &= ~self.eye_mask()
+        new_boards = self.boards.copy()
+        moving = np.zeros(count, dtype=bool)
+        pending = candidates.any(axis=1)
+        while pending.any():
+            rows = np.flatnonzero(pending)
+            keys = self.rng.random((len(rows), candidates.shape[1]))
+            keys[~candidates[rows]] = -1.0
+            points = keys.argmax(axis=1)
+            boards, legal = place(self.boards[rows], self.previous_boards[rows], points, self.piece_types[rows])
+            new_boards[rows[legal]] = boards[legal]
+            moving[rows[legal]] = True
+            candidates[rows, points] = False
+            pending[rows[legal]] = False
+            pending &= candidates.any(axis=1)
+
+        self.previous_boards = np.where(active[:, None, None], self.boards, self.previous_boards)
+        self.boards = new_boards
+        self.passes = np.where(moving, 0, np.where(active, self.passes + 1, self.passes)).astype(np.int8)
+        self.n_move = np.where(active, self.n_move + 1, self.n_move)
+        self.piece_types = np.where(active, 3 - self.piece_types, self.piece_types).astype(np.int8)
+        self.done = (self.n_move >= self.max_move) | (self.passes >= 2)
+
+    def run(self, avoid_eyes=True):
+        '''
+        Play every game to the end.
+
+        :param avoid_eyes: boolean, never fill one's own eyes.
+        :return: int array (B,) of winners, see judge_winner().
+        '''
+        while not self.done.all():
+            self.step(avoid_eyes)
+        return self.judge_winner()
+
+    def judge_winner(self):
+        '''
+        Judge the winner of every game by number of pieces, like host.GO.judge_winner.
+
+        :return: int array (B,) of the piece type of the winner (0 if it's a tie).
+        '''
+        cnt_1 = (self.boards == 1).sum(axis=(1, 2))
+        cnt_2 = (self.boards == 2).sum(axis=(1, 2)) + self.komi
+        return np.where(cnt_1 > cnt_2, 1, np.where(cnt_1 < cnt_2, 2, 0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", "-g", type=int, help="number of random games", default=4096)
+    parser.add_argument("--seed", "-s", type=int, help="random seed", default=None)
+    args = parser.parse_args()
+
+    N = 5
+    go = BatchGO(N, args.games, seed=args.seed)
+    start = time.perf_counter()
+    winners = go.run()
+    elapsed = time.perf_counter() - start
+    print("Games: {} | X: {} | O: {} | Tie: {} | {:.0f} games/s".format(
+        args.games, (winners == 1).sum(), (winners == 2).sum(), (winners == 0).sum(), args.games / elapsed))
@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: benchmark
+# Description: Speed benchmark of the search and the rules primitives on fixed positions, against a baseline
+# TodoList:
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from host import GO
+from my_player3 import MyGO, MyPlayer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+POSITIONS_PATH = os.path.join(HERE, "benchmark.json")
+BASELINE_PATH = os.path.join(HERE, "benchmark_baseline.json")
+PRIMITIVES = ('valid_place_check', 'find_died_pieces', 'place_chess', 'place')
+
+
+def load_positions(path=POSITIONS_PATH):
+    '''
+    Read the benchmark positions.
+
+    The file holds a version, bumped whenever a position is added, removed or changed so
+    results of different sets are never compared, and a list of positions with their name,
+    phase, move number, search depth, side to move, previous board and board.
+
+    :param path: positions file.
+    :return: (version, list of position dicts).
+    '''
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return data['version'], data['positions']
+
+
+def to_board(rows):
+    return [[int(x) for x in row] for row in rows]
+
+
+def call_timer(function, calls, min_seconds=0.02):
+    '''
+    Build a timer of a function over a list of argument tuples.
+
+    Like timeit, every run goes through the list as many times as it takes to last min_seconds,
+    so a short hiccup of the machine only weighs on a small part of a run.
+
+    :param function: function to time.
+    :param calls: list of argument tuples, the function is called once with each per loop.
+    :param min_seconds: shortest run.
+    :return: function running once and returning the microseconds per call.
+    '''
+    def timed(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for args in calls:
+                function(*args)
+        return time.perf_counter() - start
+
+    loops = 1
+    while timed(loops) < min_seconds:
+        loops *= 2
+    return lambda: timed(loops) / (loops * len(calls)) * 1e6
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def calibrate(repeat=5):
+    '''
+    Time a fixed pure Python workload, to tell a slower or busier machine from a slower tree.
+
+    :param repeat: runs, the fastest is kept.
+    :return: seconds of the workload.
+    '''
+    def workload():
+        board = [[0] * 5 for _ in range(5)]
+        total = 0
+        for k in range(20000):
+            i, j = divmod(k % 25, 5)
+            board[i][j] = k & 3
+            total += sum(row[j] for row in board) + (k << 3 & 0xffff)
+        return total
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return round(best, 6)
+
+
+def primitive_timers(position):
+    '''
+    Timers of the rules primitives of host.GO and the bitboard engine on a position.
+
+    valid_place_check and Bitboard.place are called on every point, find_died_pieces for both
+    piece types, and place_chess on every legal point, restoring the boards before each call.
+
+    :param position: position dict, see load_positions().
+    :return: dict of primitive -> timer, see call_timer().
+    '''
+    piece_type = position['piece_type']
+    previous_board = to_board(position['previous'])
+    board = to_board(position['board'])
+    n = len(board)
+    go = GO(n)
+    go.init_board(n)
+    go.set_board(piece_type, previous_board, board)
+    points = [(i, j) for i in range(n) for j in range(n)]
+    legal = [(i, j) for i, j in points if go.valid_place_check(i, j, piece_type, test_check=True)]
+
+    def place_chess(i, j):
+        go.board = [row[:] for row in board]
+        go.previous_board = previous_board
+        go.place_chess(i, j, piece_type)
+
+    engine = go.engine
+    bitboards = engine.from_board(board)
+    timers = {
+        'valid_place_check': call_timer(lambda i, j: go.valid_place_check(i, j, piece_type, test_check=True), points),
+        'find_died_pieces': call_timer(go.find_died_pieces, [(1,), (2,)]),
+        'place': call_timer(lambda i, j: engine.place(bitboards, engine.index(i, j), piece_type), points),
+    }
+    if legal:
+        timers['place_chess'] = call_timer(place_chess, legal)
+    return timers
+
+
+def bench_search(position):
+    '''
+    Run MyPlayer.get_input to the position's fixed depth, with a fresh player and without book,
+    cache or endgame solver, so the nodes and the move only change when the search does.
+
+    :param position: position dict, see load_positions().
+    :return: dict with the move chosen, the nodes, the wall time and the nodes per second.
+    '''
+    piece_type = position['piece_type']
+    go = MyGO(len(position['board']))
+    go.set_board(piece_type, to_board(position['previous']), to_board(position['board']))
+    go.move = position['move']
+    player = MyPlayer(depth=position['depth'])
+    start = time.perf_counter()
+    step = player.get_input(go, piece_type)
+    seconds = time.perf_counter() - start
+    nodes = 0 if player.minimax is None else player.minimax.nodes
+    return {'move': step if step == "PASS" else list(step), 'nodes': nodes, 'seconds': round(seconds, 6),
+            'nodes_per_second': round(nodes / seconds) if seconds > 0 else None}
+
+
+def run(positions, version, search=True, rules=True, repeat=5, search_repeat=3, log=print):
+    '''
+    Benchmark every position.
+
+    The runs go in rounds through all the positions, and the median of each timing is kept. A
+    slow stretch of a shared machine then slows one run of many timings, which the medians drop,
+    rather than every run of one timing.
+
+    :param positions: list of position dicts, see load_positions().
+    :param version: version of the positions.
+    :param search: boolean, benchmark MyPlayer.get_input.
+    :param rules: boolean, benchmark the rules primitives.
+    :param repeat: runs per primitive.
+    :param search_repeat: searches per position.
+    :param log: function printing the progress, one line per position.
+    :return: dict of results, the format of the baseline file.
+    '''
+    timers = {position['name']: primitive_timers(position) for position in positions} if rules else {}
+    samples = {position['name']: {'calibration': [], 'search': [], 'primitives': {}} for position in positions}
+    for turn in range(max(repeat if rules else 0, search_repeat if search else 0)):
+        for position in positions:
+            sample = samples[position['name']]
+            # Calibrated next to each position, as the speed of a shared machine drifts during the run
+            sample['calibration'].append(calibrate(1))
+            if search and turn < search_repeat:
+                sample['search'].append(bench_search(position))
+            if rules and turn < repeat:
+                for name, timer in timers[position['name']].items():
+                    sample['primitives'].setdefault(name, []).append(timer())
+
+    results = {'version': version, 'python': platform.python_version(), 'machine': platform.machine(),
+               'positions': {}}
+    for position in positions:
+        sample = samples[position['name']]
+        result = {'calibration': round(median(sample['calibration']), 6)}
+        if search:
+            # The searches are the same, only their times differ
+            result['search'] = sorted(sample['search'], key=lambda s: s['seconds'])[len(sample['search']) // 2]
+        if rules:
+            result['primitives'] = {name: round(median(us), 3) for name, us in sample['primitives'].items()}
+        results['positions'][position['name']] = result
+        line = "{:<12} {:<7}".format(position['name'], position['phase'])
+        if search:
+            s = result['search']
+            line += " depth {:>2} move {:<7} {:>8} nodes {:>8.3f}s {:>7} nodes/s".format(
+                position['depth'], formatted(s['move']), s['nodes'], s['seconds'], s['nodes_per_second'] or 0)
+        if rules:
+            primitives = result['primitives']
+            line += "  " + " ".join("{} {:.1f}us".format(name, primitives[name]) for name in PRIMITIVES
+                                    if name in primitives)
+        log(line)
+    return results
+
+
+def formatted(move):
+    return move if move == "PASS" else "{},{}".format(move[0], move[1])
+
+
+def compare(results, baseline, tolerance=0.5, warning=0.5, min_seconds=0.05, min_us=0.5):
+    '''
+    Compare results with a baseline.
+
+    Baseline timings are first scaled by how much slower the calibration workload ran, the median
+    over the positions, so a busier or slower machine does not look like a regression. Timings of
+    an unchanged tree still drift by up to about 40% on a shared machine, and a single position
+    further, so one more than warning slower than the scaled baseline is only a warning. A
+    regression is the search or a primitive slowing down by more than tolerance over the
+    positions, the median of them: a slower tree slows most positions, noise only a few. A
+    different move or node count at the same depth is reported as a change: the search behaves
+    differently, which may be intended.
+
+    :param results: dict returned by run().
+    :param baseline: dict returned by run() on an earlier tree.
+    :param tolerance: slowdown of the median position, as a fraction, past which a timing regressed.
+    :param warning: slowdown of a single position, as a fraction, past which it is reported.
+    :param min_seconds: searches faster than this in the baseline are too short to time reliably.
+    :param min_us: slowdowns of a primitive below this many microseconds are timer noise.
+    :return: (regressions, warnings, changes), lists of messages.
+    '''
+    if results['version'] != baseline['version']:
+        raise ValueError("Positions version {} does not match baseline version {}, save a new baseline".format(
+            results['version'], baseline['version']))
+    names = [name for name in results['positions'] if name in baseline['positions']]
+    if not names:
+        return [], [], []
+    scale = median([results['positions'][name]['calibration'] / baseline['positions'][name]['calibration']
+                    for name in names])
+    ratios = {}  # timing -> slowdowns of the positions against the scaled baseline
+    warnings = []
+    changes = []
+    for name in names:
+        result, base = results['positions'][name], baseline['positions'][name]
+        if 'search' in result and 'search' in base:
+            s, b = result['search'], base['search']
+            if s['move'] != b['move']:
+                changes.append("{}: move {} -> {}".format(name, formatted(b['move']), formatted(s['move'])))
+            if s['nodes'] != b['nodes']:
+                changes.append("{}: nodes {} -> {}".format(name, b['nodes'], s['nodes']))
+            if b['seconds'] >= min_seconds:
+                ratios.setdefault('search', []).append(s['seconds'] / (b['seconds'] * scale))
+                if s['seconds'] > b['seconds'] * scale * (1 + warning):
+                    warnings.append("{}: search {:.3f}s -> {:.3f}s".format(name, b['seconds'] * scale, s['seconds']))
+        for primitive, us in result.get('primitives', {}).items():
+            base_us = base.get('primitives', {}).get(primitive)
+            if base_us is None:
+                continue
+            ratios.setdefault(primitive, []).append(us / (base_us * scale))
+            if us > base_us * scale * (1 + warning) and us - base_us * scale > min_us:
+                warnings.append("{}: {} {:.1f}us -> {:.1f}us".format(name, primitive, base_us * scale, us))
+    regressions = ["{}: {:.0f}% slower over {} positions".format(timing, (median(values) - 1) * 100, len(values))
+                   for timing, values in ratios.items() if median(values) > 1 + tolerance]
+    return regressions, warnings, changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=str, help="positions file", default=POSITIONS_PATH)
+    parser.add_argument("--baseline", "-b", type=str, help="baseline file", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--only", type=str, choices=("search", "rules"), help="run one half of the suite",
+                        default=None)
+    parser.add_argument("--repeat", "-r", type=int, help="runs per primitive, the median is kept", default=5)
+    parser.add_argument("--search-repeat", type=int, help="searches per position, the median is kept", default=3)
+    parser.add_argument("--tolerance", type=float, help="slowdown of the median position allowed before a "
+                                                        "regression", default=0.5)
+    parser.add_argument("--warning", type=float, help="slowdown of one position allowed before a warning",
+                        default=0.5)
+    parser.add_argument("--output", "-o", type=str, help="also write the results to this file", default=None)
+    args = parser.parse_args(argv)
+
+    version, positions = load_positions(args.positions)
+    results = run(positions, version, search=args.only != "rules", rules=args.only != "search",
+                  repeat=args.repeat, search_repeat=args.search_repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print("Saved baseline to {}".format(args.baseline))
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline at {}, run with --save to create one".format(args.baseline))
+        return 0
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressions, warnings, changes = compare(results, baseline, args.tolerance, args.warning)
+    for message in changes:
+        print("changed    " + message)
+    for message in warnings:
+        print("slower     " + message)
+    for message in regressions:
+        print("REGRESSION " + message)
+    if not regressions:
+        print("No regression against {}".format(args.baseline))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
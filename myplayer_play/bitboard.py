@@ -0,0 +1,572 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: bitboard
+# Description: Bitboard rules engine shared by GO (host.py) and MyGO (my_player3.py)
+# TodoList:
+
+
+class Bitboard:
+    def __init__(self, n):
+        '''
+        Rules engine for an n*n board backed by integer bitboards.
+
+        Point (i, j) is bit i * n + j. A position is an immutable pair of ints
+        (black, white) holding the 'X'(1) and 'O'(2) stones, so positions can be
+        compared, hashed and copied for free.
+
+        :param n: size of the board n*n
+        '''
+        self.size = n
+        self.cells = n * n
+        self.full = (1 << self.cells) - 1
+        self.empty_position = (0, 0)
+
+        left_col = 0
+        right_col = 0
+        for i in range(n):
+            left_col |= 1 << (i * n)
+            right_col |= 1 << (i * n + n - 1)
+        self.not_left = self.full & ~left_col
+        self.not_right = self.full & ~right_col
+
+        # Precomputed orthogonal and diagonal neighbor masks for every point
+        self.neighbor_masks = []
+        self.neighbor_points = []
+        self.around_masks = []
+        for i in range(n):
+            for j in range(n):
+                neighbors = []
+                if i > 0: neighbors.append((i - 1) * n + j)
+                if i < n - 1: neighbors.append((i + 1) * n + j)
+                if j > 0: neighbors.append(i * n + j - 1)
+                if j < n - 1: neighbors.append(i * n + j + 1)
+                mask = 0
+                for p in neighbors:
+                    mask |= 1 << p
+                around = mask
+                for di, dj in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+                    if 0 <= i + di < n and 0 <= j + dj < n:
+                        around |= 1 << ((i + di) * n + j + dj)
+                self.neighbor_masks.append(mask)
+                self.neighbor_points.append(tuple(neighbors))
+                self.around_masks.append(around)
+
+        # The 8 rotations and reflections of the board, as point permutations:
+        # symmetries[k][index] is where symmetry k sends point index
+        self.symmetries = []
+        for k in range(8):
+            permutation = []
+            for i in range(n):
+                for j in range(n):
+                    a, b = (j, i) if k & 4 else (i, j)
+                    if k & 1: a = n - 1 - a
+                    if k & 2: b = n - 1 - b
+                    permutation.append(a * n + b)
+            self.symmetries.append(tuple(permutation))
+        self.inverse_symmetries = []
+        for permutation in self.symmetries:
+            inverse = [0] * self.cells
+            for index, image in enumerate(permutation):
+                inverse[image] = index
+            self.inverse_symmetries.append(tuple(inverse))
+
+    def index(self, i, j):
+        return i * self.size + j
+
+    def point(self, index):
+        return divmod(index, self.size)
+
+    def from_board(self, board):
+        '''
+        Convert a list-of-lists board into a position.
+
+        :param board: n*n board with 0 for empty, 1 for 'X' and 2 for 'O'.
+        :return: (black, white) bitboards.
+        '''
+        black = 0
+        white = 0
+        bit = 1
+        for row in board:
+            for cell in row:
+                if cell == 1:
+                    black |= bit
+                elif cell == 2:
+                    white |= bit
+                bit <<= 1
+        return black, white
+
+    def to_board(self, position):
+        '''
+        Convert a position back into a list-of-lists board.
+
+        :param position: (black, white) bitboards.
+        :return: n*n board with 0 for empty, 1 for 'X' and 2 for 'O'.
+        '''
+        black, white = position
+        n = self.size
+        board = [[0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(n):
+                bit = 1 << (i * n + j)
+                if black & bit:
+                    board[i][j] = 1
+                elif white & bit:
+                    board[i][j] = 2
+        return board
+
+    def transform(self, mask, k):
+        '''
+        Apply one of the 8 board symmetries to a bitboard.
+
+        :param mask: bitboard.
+        :param k: index in self.symmetries.
+        :return: transformed bitboard.
+        '''
+        permutation = self.symmetries[k]
+        out = 0
+        for index in iter_bits(mask):
+            out |= 1 << permutation[index]
+        return out
+
+    def canonical(self, position):
+        '''
+        Smallest of the 8 symmetric images of a position, so symmetric positions share one representative.
+
+        :param position: (black, white) bitboards.
+        :return: (canonical position, k) with canonical position == position transformed by symmetry k.
+        '''
+        best = None
+        for k in range(8):
+            image = (self.transform(position[0], k), self.transform(position[1], k))
+            if best is None or image < best[0]:
+                best = (image, k)
+        return best
+
+    def stones(self, position, piece_type):
+        return position[0] if piece_type == 1 else position[1]
+
+    def empty(self, position):
+        return self.full & ~(position[0] | position[1])
+
+    def dilate(self, mask):
+        '''
+        Grow a set of points by one step in the four directions.
+
+        :param mask: bitboard of points.
+        :return: bitboard of the points and all their orthogonal neighbors.
+        '''
+        n = self.size
+        return (mask | ((mask << 1) & self.not_left) | ((mask >> 1) & self.not_right)
+                | (mask << n) | (mask >> n)) & self.full
+
+    def neighbours(self, mask):
+        '''
+        Points next to a set of points, like dilate() without the points themselves.
+
+        :param mask: bitboard of points.
+        :return: bitboard of the orthogonal neighbors of the points, a point of mask only
+                 when it is next to another one.
+        '''
+        n = self.size
+        return (((mask << 1) & self.not_left) | ((mask >> 1) & self.not_right)
+                | (mask << n) | (mask >> n)) & self.full
+
+    def group(self, stones, index):
+        '''
+        Flood fill the connected group of stones containing a given point.
+
+        :param stones: bitboard of stones of one color.
+        :param index: point inside the group.
+        :return: bitboard of the group.
+        '''
+        group = 1 << index
+        while True:
+            grown = self.dilate(group) & stones
+            if grown == group:
+                return group
+            group = grown
+
+    def liberties(self, position, group):
+        '''
+        Find the liberties of a group.
+
+        :param position: (black, white) bitboards.
+        :param group: bitboard of a group of stones.
+        :return: bitboard of the empty points next to the group.
+        '''
+        return self.dilate(group) & self.empty(position)
+
+    def dead_stones(self, position, piece_type):
+        '''
+        Find all stones of a given type whose group has no liberty.
+
+        :param position: (black, white) bitboards.
+        :param piece_type: 1('X') or 2('O').
+        :return: bitboard of the dead stones.
+        '''
+        stones = self.stones(position, piece_type)
+        empty = self.empty(position)
+        dead = 0
+        remaining = stones
+        while remaining:
+            low = remaining & -remaining
+            group = self.group(stones, low.bit_length() - 1)
+            remaining &= ~group
+            if not self.dilate(group) & empty:
+                dead |= group
+        return dead
+
+    def remove(self, position, mask):
+        return position[0] & ~mask, position[1] & ~mask
+
+    def place(self, position, index, piece_type):
+        '''
+        Place a stone and remove the captured opponent stones.
+
+        :param position: (black, white) bitboards.
+        :param index: point to play.
+        :param piece_type: 1('X') or 2('O').
+        :return: (new position, captured bitboard), or None if the point is occupied or the move is suicide.
+        '''
+        black, white = position
+        bit = 1 << index
+        if (black | white) & bit:
+            return None
+        if piece_type == 1:
+            own = black | bit
+            opp = white
+        else:
+            own = white | bit
+            opp = black
+        empty = self.full & ~(own | opp)
+
+        # Only the opponent groups touching the played point can lose their last liberty
+        captured = 0
+        adjacent = self.neighbor_masks[index] & opp
+        while adjacent:
+            low = adjacent & -adjacent
+            group = self.group(opp, low.bit_length() - 1)
+            adjacent &= ~group
+            if not self.dilate(group) & empty:
+                captured |= group
+        if captured:
+            opp &= ~captured
+            empty |= captured
+        elif not self.neighbor_masks[index] & empty:
+            if not self.dilate(self.group(own, index)) & empty:
+                return None
+
+        if piece_type == 1:
+            return (own, opp), captured
+        return (opp, own), captured
+
+    def apply(self, position, index, piece_type, captured):
+        '''
+        Build the position after a placement whose captures are already known.
+
+        :param position: (black, white) bitboards.
+        :param index: point played.
+        :param piece_type: 1('X') or 2('O').
+        :param captured: bitboard of the opponent stones removed by the placement.
+        :return: (black, white) bitboards after the placement.
+        '''
+        black, white = position
+        bit = 1 << index
+        if piece_type == 1:
+            return black | bit, white & ~captured
+        return black & ~captured, white | bit
+
+    def is_legal(self, position, index, piece_type, ko_position=None):
+        '''
+        Check whether a placement is valid, including the KO rule.
+
+        :param position: (black, white) bitboards.
+        :param index: point to play.
+        :param piece_type: 1('X') or 2('O').
+        :param ko_position: position the move may not recreate, None if there is no KO to check.
+        :return: boolean indicating whether the placement is valid.
+        '''
+        result = self.place(position, index, piece_type)
+        if result is None:
+            return False
+        return not (result[1] and result[0] == ko_position)
+
+    def legal_moves(self, position, piece_type, ko_position=None):
+        '''
+        Find all valid placements.
+
+        :param position: (black, white) bitboards.
+        :param piece_type: 1('X') or 2('O').
+        :param ko_position: position the move may not recreate, None if there is no KO to check.
+        :return: a list of legal point indexes in board order.
+        '''
+        return [index for index in iter_bits(self.empty(position))
+                if self.is_legal(position, index, piece_type, ko_position)]
+
+    def ko_point(self, position, ko_position, piece_type):
+        '''
+        Find the point the KO rule forbids.
+
+        :param position: (black, white) bitboards.
+        :param ko_position: position the move may not recreate, None if there is no KO to check.
+        :param piece_type: 1('X') or 2('O').
+        :return: the point index where piece_type may not play, None if there is none.
+        '''
+        if ko_position is None:
+            return None
+        # Only retaking a single stone lost on the last move can repeat ko_position
+        lost = self.stones(ko_position, piece_type) & ~(position[0] | position[1])
+        if not lost or lost & (lost - 1):
+            return None
+        index = lost.bit_length() - 1
+        result = self.place(position, index, piece_type)
+        if result is not None and result[1] and result[0] == ko_position:
+            return index
+        return None
+
+
+
+class Chains:
+    def __init__(self, engine, position):
+        '''
+        Groups and liberties of a position, maintained incrementally with union-find.
+
+        Every stone points to the root of its group; each root keeps the bitboards of
+        its stones and liberties, so captures and suicide are decided by looking at the
+        groups next to the played point only.
+
+        :param engine: Bitboard instance.
+        :param position: (black, white) bitboards.
+        '''
+        self.engine = engine
+        self.position = position
+        self.parent = list(range(engine.cells))
+        self.stones = {}  # root -> bitboard of the group's stones
+        self.libs = {}  # root -> bitboard of the group's liberties
+
+        empty = engine.empty(position)
+        for color in position:
+            remaining = color
+            while remaining:
+                low = remaining & -remaining
+                root = low.bit_length() - 1
+                group = engine.group(color, root)
+                remaining &= ~group
+                for member in iter_bits(group):
+                    self.parent[member] = root
+                self.stones[root] = group
+                self.libs[root] = engine.dilate(group) & empty
+
+    def copy(self):
+        '''
+        Copy the chains for a child position.
+
+        :return: the copied Chains instance.
+        '''
+        chains = Chains.__new__(Chains)
+        chains.engine = self.engine
+        chains.position = self.position
+        chains.parent = self.parent[:]
+        chains.stones = self.stones.copy()
+        chains.libs = self.libs.copy()
+        return chains
+
+    def find(self, index):
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def group(self, index):
+        return self.stones[self.find(index)]
+
+    def liberties(self, index):
+        return self.libs[self.find(index)]
+
+    def captures(self, index, piece_type):
+        '''
+        Find the opponent stones a placement would capture, without playing it.
+
+        :param index: empty point to play.
+        :param piece_type: 1('X') or 2('O').
+        :return: bitboard of the captured stones.
+        '''
+        bit = 1 << index
+        opp = self.position[1] if piece_type == 1 else self.position[0]
+        captured = 0
+        for q in self.engine.neighbor_points[index]:
+            if opp >> q & 1:
+                root = self.find(q)
+                if self.libs[root] == bit:
+                    captured |= self.stones[root]
+        return captured
+
+    def is_suicide(self, index, piece_type, captured=0):
+        '''
+        Check whether a placement leaves its own group without liberty.
+
+        :param index: empty point to play.
+        :param piece_type: 1('X') or 2('O').
+        :param captured: stones the placement captures, as returned by captures().
+        :return: boolean indicating whether the placement is suicide.
+        '''
+        if captured:
+            return False
+        engine = self.engine
+        black, white = self.position
+        if engine.neighbor_masks[index] & ~(black | white):
+            return False
+        own = black if piece_type == 1 else white
+        bit = 1 << index
+        for q in engine.neighbor_points[index]:
+            if own >> q & 1 and self.libs[self.find(q)] & ~bit:
+                return False
+        return True
+
+    def play(self, index, piece_type):
+        '''
+        Place a stone, merging and capturing groups around it. The placement must be legal.
+
+        :param index: empty point to play.
+        :param piece_type: 1('X') or 2('O').
+        :return: bitboard of the captured stones.
+        '''
+        engine = self.engine
+        parent = self.parent
+        stones = self.stones
+        libs = self.libs
+        black, white = self.position
+        bit = 1 << index
+        if piece_type == 1:
+            own = black | bit
+            opp = white
+        else:
+            own = white | bit
+            opp = black
+
+        root = index
+        parent[index] = index
+        stones[index] = bit
+        libs[index] = engine.neighbor_masks[index] & ~(own | opp)
+        captured = 0
+        for q in engine.neighbor_points[index]:
+            if own >> q & 1:
+                other = self.find(q)
+                if other == root:
+                    continue
+                # Union by size keeps the trees shallow
+                if popcount(stones[other]) > popcount(stones[root]):
+                    root, other = other, root
+                parent[other] = root
+                stones[root] |= stones.pop(other)
+                libs[root] |= libs.pop(other)
+            elif opp >> q & 1:
+                other = self.find(q)
+                if other in libs:
+                    libs[other] &= ~bit
+                    if not libs[other]:
+                        captured |= stones.pop(other)
+                        del libs[other]
+        libs[root] &= ~bit
+
+        if captured:
+            opp &= ~captured
+            for q in iter_bits(captured):
+                parent[q] = q
+                for n in engine.neighbor_points[q]:
+                    if own >> n & 1:
+                        libs[self.find(n)] |= 1 << q
+
+        self.position = (own, opp) if piece_type == 1 else (opp, own)
+        return captured
+
+    def dead_stones(self, piece_type):
+        stones = self.engine.stones(self.position, piece_type)
+        dead = 0
+        for root, group in self.stones.items():
+            if group & stones and not self.libs[root]:
+                dead |= group
+        return dead
+
+    def unconditional_life(self, piece_type):
+        '''
+        Benson's algorithm: find the groups that stay alive whatever the opponent plays,
+        even if their owner always passes.
+
+        The regions are the connected sets of points without piece_type stones. A region is
+        vital to a group when all its empty points are liberties of the group. Groups with
+        fewer than two vital regions, and regions next to such groups, are dropped until
+        nothing changes; the groups left are unconditionally alive.
+
+        :param piece_type: 1('X') or 2('O').
+        :return: (alive, vital), bitboards of the alive stones and of the regions vital to them.
+        '''
+        engine = self.engine
+        own = engine.stones(self.position, piece_type)
+        rest = engine.full & ~own
+        empty = engine.empty(self.position)
+        # A region with an empty point away from every stone of ours is vital to no group and
+        # never counts, so all such regions are flooded at once and left out
+        dilate = engine.dilate
+        outside = empty & ~dilate(own)
+        while True:
+            grown = dilate(outside) & rest
+            if grown == outside:
+                break
+            outside = grown
+        rest &= ~outside
+        if popcount(rest & empty) < 2:
+            return 0, 0
+        regions = []
+        remaining = rest
+        while remaining:
+            low = remaining & -remaining
+            region = engine.group(rest, low.bit_length() - 1)
+            remaining &= ~region
+            regions.append(region)
+        if len(regions) < 2:
+            return 0, 0
+
+        # vital[root] lists the regions vital to a group, borders[r] holds the stones around region r
+        borders = [engine.dilate(region) & own for region in regions]
+        vital = {}
+        for root, group in self.stones.items():
+            if own >> root & 1:
+                libs = self.libs[root]
+                vital[root] = [r for r, region in enumerate(regions) if not region & empty & ~libs]
+        groups = set(vital)
+        healthy = set(range(len(regions)))
+        while True:
+            alive = 0
+            for root in groups:
+                alive |= self.stones[root]
+            healthy = {r for r in healthy if not borders[r] & ~alive}
+            kept = {root for root in groups if sum(1 for r in vital[root] if r in healthy) >= 2}
+            if kept == groups:
+                break
+            groups = kept
+        vital_regions = 0
+        for root in groups:
+            for r in vital[root]:
+                if r in healthy:
+                    vital_regions |= regions[r]
+        return alive, vital_regions
+
+
+def iter_bits(mask):
+    '''
+    Iterate over the set bits of a bitboard from the lowest point.
+
+    :param mask: bitboard.
+    :return: generator of point indexes.
+    '''
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask):
+    return bin(mask).count('1')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: book
+# Description: Opening book of searched moves for the first plies, built offline and stored on disk
+# TodoList:
+
+import argparse
+import os
+import struct
+import time
+
+from bitboard import Bitboard
+from evaluation import SEARCH_VERSION
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+MAGIC = b'GOBK'
+VERSION = 2
+HEADER = struct.Struct('<4sBBH')  # magic, version, board size, SEARCH_VERSION the moves were searched with
+RECORD = struct.Struct('<IIBB')  # canonical black, canonical white, side to move, move in the canonical frame
+
+
+class OpeningBook:
+    def __init__(self, engine):
+        '''
+        Best moves of early positions, stored once for each set of 8 symmetric positions.
+
+        Entries are keyed by the stones and the side to move only, so the book must not be
+        used when the KO rule forbids a point.
+
+        :param engine: Bitboard instance.
+        '''
+        self.engine = engine
+        self.moves = {}
+
+    def __len__(self):
+        return len(self.moves)
+
+    def add(self, position, piece_type, index):
+        '''
+        Record the move to play in a position.
+
+        :param position: (black, white) bitboards.
+        :param piece_type: side to move.
+        :param index: point to play.
+        :return: None.
+        '''
+        canonical, k = self.engine.canonical(position)
+        self.moves[(canonical, piece_type)] = self.engine.symmetries[k][index]
+
+    def lookup(self, position, piece_type):
+        '''
+        Find the move to play in a position.
+
+        :param position: (black, white) bitboards.
+        :param piece_type: side to move.
+        :return: point index, or None if the position is not in the book.
+        '''
+        canonical, k = self.engine.canonical(position)
+        index = self.moves.get((canonical, piece_type))
+        if index is None:
+            return None
+        return self.engine.inverse_symmetries[k][index]
+
+    def save(self, path=BOOK_PATH):
+        records = sorted((black, white, piece_type, index)
+                         for ((black, white), piece_type), index in self.moves.items())
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.engine.size, SEARCH_VERSION))
+            for record in records:
+                f.write(RECORD.pack(*record))
+
+    @classmethod
+    def load(cls, engine, path=BOOK_PATH):
+        '''
+        Read a book written by save().
+
+        A book of another version, board size or SEARCH_VERSION, or a truncated one, is
+        ignored: its moves are stale, and the player searches them instead.
+
+        :param engine: Bitboard instance.
+        :param path: book file.
+        :return: OpeningBook, empty if the file does not exist or is ignored.
+        '''
+        book = cls(engine)
+        if not os.path.exists(path):
+            return book
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size or (len(data) - HEADER.size) % RECORD.size:
+            return book
+        if HEADER.unpack_from(data) != (MAGIC, VERSION, engine.size, SEARCH_VERSION):
+            return book
+        for black, white, piece_type, index in RECORD.iter_unpack(data[HEADER.size:]):
+            book.moves[((black, white), piece_type)] = index
+        return book
+
+
+def build(n, plies, new_player, log=print):
+    '''
+    Search every position of the first plies that can arise when one side follows the book.
+
+    For each side, the positions where it moves are searched and only the chosen move is
+    followed, while every legal reply of the other side is followed. Symmetric positions are
+    searched once.
+
+    Every position is searched by a new player, as in a game, so no search starts from the
+    tables an earlier one left and the book plays what the player would.
+
+    :param n: size of the board n*n
+    :param plies: number of plies from the empty board covered by the book.
+    :param new_player: function returning the MyPlayer a position is searched with.
+    :param log: function printing the progress, None to stay quiet.
+    :return: OpeningBook.
+    '''
+    from my_player3 import MyGO
+
+    engine = Bitboard(n)
+    book = OpeningBook(engine)
+    for own in (1, 2):
+        frontier = {engine.empty_position: (engine.empty_position, engine.empty_position)}
+        for ply in range(plies):
+            piece_type = 1 if ply % 2 == 0 else 2
+            following = {}
+            for position, ko_position in frontier.values():
+                if piece_type == own:
+                    go = MyGO(n)
+                    go.set_board(piece_type, engine.to_board(ko_position), engine.to_board(position))
+                    go.move = ply
+                    if go.ko_point(go.chains, piece_type, go.prev_position) is not None:
+                        continue
+                    index = book.lookup(position, piece_type)
+                    if index is None:
+                        start = time.time()
+                        step = new_player().get_input(go, piece_type)
+                        if step == "PASS":
+                            continue
+                        index = engine.index(step[0], step[1])
+                        book.add(position, piece_type, index)
+                        if log is not None:
+                            log("ply {} | {} entries | {} in {:.1f}s".format(ply, len(book), step, time.time() - start))
+                    moves = [index]
+                else:
+                    moves = engine.legal_moves(position, piece_type, ko_position)
+                for index in moves:
+                    child = engine.place(position, index, piece_type)[0]
+                    following.setdefault(engine.canonical(child)[0], (child, position))
+            frontier = following
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plies", type=int, help="number of plies covered by the book", default=5)
+    parser.add_argument("--time", "-t", type=float, help="seconds of search per position", default=3.0)
+    parser.add_argument("--output", "-o", type=str, help="book file", default=BOOK_PATH)
+    args = parser.parse_args()
+
+    from my_player3 import MyPlayer
+
+    N = 5
+    book = build(N, args.plies, lambda: MyPlayer(depth=N * N - 1, time_limit=args.time))
+    book.save(args.output)
+    print("{} entries written to {}".format(len(book), args.output))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: cache
+# Description: Memory-mapped position cache keeping search results across moves, games and processes
+# TodoList:
+
+import mmap
+import os
+import struct
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache.bin")
+MAGIC = b'GOPC'
+VERSION = 5  # bump when MyGO.reward or the key layout changes, so old results are dropped
+HEADER = struct.Struct('<4sHBB8x')  # magic, version, log2 of the number of slots, generation
+RECORD = struct.Struct('<QQ')  # key ^ data, data
+PASS_MOVE = 0xfe
+NO_MOVE = 0xff
+VALID = 1 << 56  # set in every stored data word, so an all-zero slot is empty
+# Search values are relative to the player searched for, which is mixed into the key
+PERSPECTIVE_KEYS = (0, 0x9e3779b97f4a7c15, 0xc2b2ae3d27d4eb4f)
+
+
+class PositionCache:
+    def __init__(self, path=CACHE_PATH, bits=18, n=5):
+        '''
+        Fixed-size hash table of search results in a file mapped into memory.
+
+        Opening it maps the file without reading it, so startup costs the same for any size.
+        Slots are written without locks: a slot holds (key ^ data, data), and a slot torn by
+        two processes writing at once no longer matches its key, so it reads as a miss.
+
+        :param path: cache file, created or reset when it does not match VERSION and bits.
+        :param bits: log2 of the number of 16-byte slots.
+        :param n: size of the board n*n
+        '''
+        self.path = path
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.n = n
+        self.salt = 0
+        self.hits = 0
+        self.probes = 0
+        length = HEADER.size + RECORD.size * self.size
+        with open(path, 'ab'):
+            pass
+        with open(path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            valid = f.tell() == length
+            if valid:
+                f.seek(0)
+                magic, version, stored_bits, _ = HEADER.unpack(f.read(HEADER.size))
+                valid = (magic, version, stored_bits) == (MAGIC, VERSION, bits)
+            if not valid:
+                f.truncate(0)
+                f.truncate(length)
+                f.write(HEADER.pack(MAGIC, VERSION, bits, 0))
+                f.flush()
+            self.map = mmap.mmap(f.fileno(), length)
+        self.generation = 0
+        self.refresh()
+
+    def set_perspective(self, piece_type):
+        '''
+        Select the player the stored values are relative to.
+
+        :param piece_type: 1('X') or 2('O').
+        :return: None.
+        '''
+        self.salt = PERSPECTIVE_KEYS[piece_type]
+
+    def new_search(self):
+        '''
+        Start a new generation, so this search may overwrite the results of earlier ones.
+        Only the process owning the search calls it, once per move; the others refresh().
+
+        :return: None.
+        '''
+        magic, version, bits, generation = HEADER.unpack_from(self.map, 0)
+        self.generation = (generation + 1) & 0xff
+        HEADER.pack_into(self.map, 0, magic, version, bits, self.generation)
+
+    def refresh(self):
+        '''
+        Read the generation another process started, to store results under it.
+
+        :return: None.
+        '''
+        self.generation = HEADER.unpack_from(self.map, 0)[3]
+
+    def probe(self, key):
+        '''
+        Look up a position.
+
+        :param key: Zobrist key.
+        :return: (depth, value, bound, best move), or None if the position is not stored.
+        '''
+        self.probes += 1
+        key ^= self.salt
+        check, data = RECORD.unpack_from(self.map, HEADER.size + (key & self.mask) * RECORD.size)
+        if not data or check ^ data != key:
+            return None
+        self.hits += 1
+        index = data >> 40 & 0xff
+        if index == NO_MOVE:
+            best_move = None
+        elif index == PASS_MOVE:
+            best_move = "PASS"
+        else:
+            best_move = divmod(index, self.n)
+        return data & 0xffff, (data >> 16 & 0xffff) - 0x8000, data >> 32 & 0xff, best_move
+
+    def store(self, key, depth, value, bound, best_move):
+        '''
+        Store a search result. A slot holding another position is kept when it was searched
+        deeper during the current generation.
+
+        :param key: Zobrist key.
+        :param depth: remaining depth the value was searched to.
+        :param value: search value.
+        :param bound: EXACT, LOWER or UPPER.
+        :param best_move: best move found, None if there is none.
+        :return: None.
+        '''
+        key ^= self.salt
+        offset = HEADER.size + (key & self.mask) * RECORD.size
+        check, data = RECORD.unpack_from(self.map, offset)
+        if data and check ^ data != key and data >> 48 & 0xff == self.generation and data & 0xffff > depth:
+            return
+        if best_move == "PASS":
+            index = PASS_MOVE
+        elif best_move is not None:
+            index = best_move[0] * self.n + best_move[1]
+        elif data and check ^ data == key:
+            index = data >> 40 & 0xff
+        else:
+            index = NO_MOVE
+        data = VALID | self.generation << 48 | index << 40 | bound << 32 | (value + 0x8000) << 16 | depth
+        RECORD.pack_into(self.map, offset, key ^ data, data)
+
+    def clear(self):
+        self.map[HEADER.size:] = bytes(RECORD.size * self.size)
+        self.hits = 0
+        self.probes = 0
+
+    def close(self):
+        self.map.close()
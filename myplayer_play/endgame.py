@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: endgame
+# Description: Exact solver for the last moves of a game, with a tablebase file of solved positions
+# TodoList:
+
+import os
+import struct
+import time
+
+from transposition import EXACT, LOWER, UPPER
+
+TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgame.bin")
+MAGIC = b'GOEG'
+VERSION = 2
+HEADER = struct.Struct('<4sBBBx')  # magic, version, board size, max move
+RECORD = struct.Struct('<QbB')  # key, value for the side to move, best move
+PASS = 0xfe  # point index standing for a pass
+NO_MOVE = 0xff
+
+
+class SolveTimeout(Exception):
+    pass
+
+
+class EndgameSolver:
+    def __init__(self, go, moves=10, path=None, persist_moves=6, max_entries=1 << 20):
+        '''
+        Searches to the end of the game, scoring the final position with MyGO.judge_winner.
+
+        Positions are valued +1 (the side to move wins), 0 (tie) or -1. Passing is a legal
+        move, and a pass right after the opponent's pass ends the game like host.GO.game_end.
+
+        :param go: MyGO instance giving the rules, the Bitboard engine and the Zobrist keys, so
+                   positions are keyed like in the transposition table.
+        :param moves: solve when at most this many moves are left.
+        :param path: tablebase file read on the first solve and extended by save(), None to keep results in memory.
+        :param persist_moves: positions with at least this many moves left are written by save().
+        :param max_entries: the table is emptied when it grows past this many positions.
+        '''
+        self.go = go
+        self.engine = go.engine
+        self.zobrist = go.zobrist
+        self.max_move = go.max_move
+        self.moves = moves
+        self.path = path
+        self.loaded = False
+        self.persist_moves = persist_moves
+        self.max_entries = max_entries
+        self.table = {}  # key -> (value, bound, best move in the frame of the key's image)
+        self.persist = set()  # keys of positions save() writes
+        self.stored = set()  # keys read from or already written to the tablebase file
+        self.deadline = None
+        self.nodes = 0
+
+    def judge(self, position, piece_type):
+        # MyGO.judge_winner, seen from piece_type
+        winner = self.go.judge_winner(position)
+        if winner == 0:
+            return 0
+        return 1 if winner == piece_type else -1
+
+    def key(self, position, ko_position, board_hash, piece_type, move):
+        ko_point = self.engine.ko_point(position, ko_position, piece_type)
+        return self.zobrist.key(board_hash, piece_type, ko_point, move, position, ko_position == position)
+
+    def solve(self, position, ko_position, piece_type, move, deadline=None):
+        '''
+        Solve a position.
+
+        :param position: (black, white) bitboards.
+        :param ko_position: position before the opponent's last move.
+        :param piece_type: side to move.
+        :param move: number of moves played so far, like host.GO.n_move.
+        :param deadline: time.time() at which to give up, None to search to the end.
+        :return: (value, best move) with the move a point index or "PASS", None if the deadline passed.
+        '''
+        if self.path is not None and not self.loaded:
+            self.load()
+        self.deadline = deadline
+        self.nodes = 0
+        if len(self.table) > self.max_entries:
+            self.table.clear()
+            self.persist.clear()
+        try:
+            value, step = self.negamax(position, ko_position, self.zobrist.board_hash(position), piece_type, move,
+                                       -1, 1)
+        except SolveTimeout:
+            return None
+        return value, "PASS" if step == PASS else step
+
+    def negamax(self, position, ko_position, board_hash, piece_type, move, alpha, beta):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 1023 and time.time() > self.deadline:
+            raise SolveTimeout()
+        if move >= self.max_move:
+            return self.judge(position, piece_type), None
+
+        engine = self.engine
+        key, symmetry = self.key(position, ko_position, board_hash, piece_type, move)
+        entry = self.table.get(key)
+        first = None
+        if entry is not None:
+            value, bound, first = entry
+            if first is not None and first != PASS:
+                first = engine.inverse_symmetries[symmetry][first]
+            if bound == EXACT or (bound == LOWER and value >= beta) or (bound == UPPER and value <= alpha):
+                return value, first
+
+        alpha_orig = alpha
+        steps = engine.legal_moves(position, piece_type, ko_position) + [PASS]
+        if first is not None and first in steps:
+            steps.remove(first)
+            steps.insert(0, first)
+        best, best_step = -2, None
+        for step in steps:
+            if step == PASS:
+                if ko_position == position:
+                    value = self.judge(position, piece_type)
+                else:
+                    value = -self.negamax(position, position, board_hash, 3 - piece_type, move + 1, -beta, -alpha)[0]
+            else:
+                child, captured = engine.place(position, step, piece_type)
+                child_hash = self.zobrist.update(board_hash, step, piece_type, captured)
+                value = -self.negamax(child, position, child_hash, 3 - piece_type, move + 1, -beta, -alpha)[0]
+            if value > best:
+                best, best_step = value, step
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+
+        # A win or a loss cannot be improved on, so those bounds are exact
+        if best <= alpha_orig and best > -1:
+            bound = UPPER
+        elif best >= beta and best < 1:
+            bound = LOWER
+        else:
+            bound = EXACT
+        stored = best_step
+        if stored is not None and stored != PASS:
+            stored = engine.symmetries[symmetry][stored]
+        self.table[key] = (best, bound, stored)
+        if self.max_move - move >= self.persist_moves:
+            self.persist.add(key)
+        return best, best_step
+
+    def save(self):
+        '''
+        Append the exactly solved positions far enough from the end of the game to the tablebase.
+
+        :return: number of positions written.
+        '''
+        if self.path is None:
+            return 0
+        records = []
+        for key, (value, bound, step) in self.table.items():
+            if bound == EXACT and key not in self.stored and key in self.persist:
+                records.append(RECORD.pack(key, value, NO_MOVE if step is None else step))
+                self.stored.add(key)
+        if not records:
+            return 0
+        with open(self.path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(HEADER.pack(MAGIC, VERSION, self.engine.size, self.max_move))
+            f.write(b''.join(records))
+        return len(records)
+
+    def load(self):
+        '''
+        Read the positions solved by earlier processes, if the tablebase file exists.
+
+        Like PositionCache, a file that does not match VERSION, the board or max_move is
+        emptied instead of failing the move, as is one cut short inside its header.
+
+        :return: number of positions read.
+        '''
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if not data:
+            return 0
+        if len(data) < HEADER.size or HEADER.unpack_from(data) != (MAGIC, VERSION, self.engine.size, self.max_move):
+            with open(self.path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, self.engine.size, self.max_move))
+            return 0
+        body = data[HEADER.size:]
+        body = body[:len(body) - len(body) % RECORD.size]
+        for key, value, step in RECORD.iter_unpack(body):
+            self.table[key] = (value, EXACT, None if step == NO_MOVE else step)
+            self.stored.add(key)
+        return len(self.stored)
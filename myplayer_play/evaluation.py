@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: evaluation
+# Description: Weighted feature evaluation of a position from its bitboards and groups
+# TodoList:
+
+from bitboard import popcount
+
+# Bump when the evaluation or the search makes MyPlayer choose other moves, so the opening book
+# searched with the old ones is ignored until it is built again
+SEARCH_VERSION = 1
+FEATURES = ('stones', 'territory', 'eyes', 'liberties', 'atari', 'dead')
+# Integer weights, so values stay integers in the transposition table and the position cache
+DEFAULT_WEIGHTS = {
+    'stones': 4,  # stones on the board, what host.GO.judge_winner counts
+    'territory': 2,  # empty points only reached by our stones
+    'eyes': 1,  # empty points whose neighbors are all our stones, also counted in territory
+    'liberties': 1,  # empty points next to our stones
+    'atari': -3,  # our groups with a single liberty
+    'dead': -4,  # our stones inside the vital regions of unconditionally alive opponent groups
+}
+
+
+class Evaluator:
+    def __init__(self, engine, weights=None, life_entries=1 << 16):
+        '''
+        Scores a position as the weighted difference of features between the two players.
+
+        Every feature is a few shifts and masks on the bitboards plus a pass over the groups
+        whose liberties Chains already maintains, so no point is visited one by one.
+
+        :param engine: Bitboard instance.
+        :param weights: dict of feature name -> int weight, overriding DEFAULT_WEIGHTS.
+        :param life_entries: the cache of life() is emptied when it grows past this many positions.
+        '''
+        self.engine = engine
+        self.life_entries = life_entries
+        self.life_cache = {}  # (own stones, empty points) -> (alive, vital)
+        self.weights = dict(DEFAULT_WEIGHTS)
+        for name, weight in (weights or {}).items():
+            if name not in self.weights:
+                raise ValueError("Unknown feature {}".format(name))
+            self.weights[name] = weight
+        self.w_stones, self.w_territory, self.w_eyes, self.w_liberties, self.w_atari, self.w_dead = (
+            self.weights[name] for name in FEATURES)
+
+    def life(self, chains, piece_type):
+        '''
+        Chains.unconditional_life, cached because iterative deepening meets the same positions
+        again and the search asks for it when generating moves too.
+
+        :param chains: Chains of the position.
+        :param piece_type: 1('X') or 2('O').
+        :return: (alive, vital), bitboards of the alive stones and of the regions vital to them.
+        '''
+        position = chains.position
+        key = (position[piece_type - 1], position[0] | position[1])
+        found = self.life_cache.get(key)
+        if found is None:
+            if len(self.life_cache) > self.life_entries:
+                self.life_cache.clear()
+            found = self.life_cache[key] = chains.unconditional_life(piece_type)
+        return found
+
+    def reach(self, seeds, empty):
+        '''
+        Empty points connected to a set of stones through empty points.
+
+        :param seeds: bitboard of stones.
+        :param empty: bitboard of the empty points.
+        :return: bitboard of the reached empty points.
+        '''
+        dilate = self.engine.dilate
+        region = dilate(seeds) & empty
+        while True:
+            grown = dilate(region) & empty
+            if grown == region:
+                return region
+            region = grown
+
+    def features(self, chains, piece_type):
+        '''
+        Feature counts of both players.
+
+        :param chains: Chains of the position.
+        :param piece_type: 1('X') or 2('O'), the player counted first.
+        :return: (own, opponent), tuples of counts in the order of FEATURES.
+        '''
+        engine = self.engine
+        position = chains.position
+        own = position[piece_type - 1]
+        opponent = position[2 - piece_type]
+        empty = engine.full & ~(own | opponent)
+        own_reach = self.reach(own, empty)
+        opponent_reach = self.reach(opponent, empty)
+        own_atari = opponent_atari = 0
+        for root, libs in chains.libs.items():
+            if not libs & (libs - 1):
+                if own >> root & 1:
+                    own_atari += 1
+                else:
+                    opponent_atari += 1
+        # Stones in the vital regions of an unconditionally alive group can never live (Benson)
+        own_dead = opponent_dead = 0
+        if self.w_dead:
+            opponent_dead = opponent & self.life(chains, piece_type)[1]
+            own_dead = own & self.life(chains, 3 - piece_type)[1]
+        dilate = engine.dilate
+        neighbours = engine.neighbours
+        return ((popcount(own), popcount(own_reach & ~opponent_reach),
+                 popcount(empty & ~neighbours(engine.full & ~own)), popcount(dilate(own) & empty), own_atari,
+                 popcount(own_dead)),
+                (popcount(opponent), popcount(opponent_reach & ~own_reach),
+                 popcount(empty & ~neighbours(engine.full & ~opponent)), popcount(dilate(opponent) & empty),
+                 opponent_atari, popcount(opponent_dead)))
+
+    def evaluate(self, chains, piece_type):
+        '''
+        Score of a position for one player.
+
+        :param chains: Chains of the position.
+        :param piece_type: 1('X') or 2('O').
+        :return: int, the opposite of the score for the other player.
+        '''
+        own, opponent = self.features(chains, piece_type)
+        return (self.w_stones * (own[0] - opponent[0]) + self.w_territory * (own[1] - opponent[1])
+                + self.w_eyes * (own[2] - opponent[2]) + self.w_liberties * (own[3] - opponent[3])
+                + self.w_atari * (own[4] - opponent[4]) + self.w_dead * (own[5] - opponent[5]))
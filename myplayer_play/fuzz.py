@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: fuzz
+# Description: Differential fuzzer of the rules between the original host.py, host.GO, MyGO and the bitboard engine
+# TodoList:
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from copy import deepcopy
+
+from batch import BatchGO, place as batch_place
+from bitboard import Chains, iter_bits
+from host import GO
+from my_player3 import MyGO
+from record import GameRecord, RecordWriter
+
+
+class RulesMismatch(Exception):
+    pass
+
+
+class ReferenceGO:
+    def __init__(self, n):
+        '''
+        The rules of host.py as first shipped, on lists of lists with a depth first search per
+        group and a copy of the board per placement. Slow, but it is the rules the graders run,
+        so every other implementation is checked against it.
+
+        :param n: size of the board n*n
+        '''
+        self.size = n
+        self.board = [[0] * n for _ in range(n)]
+        self.previous_board = [[0] * n for _ in range(n)]
+        self.died_pieces = []
+        self.n_move = 0
+        self.max_move = n * n - 1
+        self.komi = n / 2
+        self.neighbor_table = {(i, j): [(x, y) for x, y in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+                                        if 0 <= x < n and 0 <= y < n]
+                               for i in range(n) for j in range(n)}
+
+    def neighbors(self, i, j):
+        return self.neighbor_table[(i, j)]
+
+    def ally_dfs(self, board, i, j):
+        stack = [(i, j)]
+        members = []
+        while stack:
+            piece = stack.pop()
+            members.append(piece)
+            for x, y in self.neighbors(*piece):
+                if board[x][y] == board[i][j] and (x, y) not in stack and (x, y) not in members:
+                    stack.append((x, y))
+        return members
+
+    def find_liberty(self, board, i, j):
+        for x, y in self.ally_dfs(board, i, j):
+            for a, b in self.neighbors(x, y):
+                if board[a][b] == 0:
+                    return True
+        return False
+
+    def find_died_pieces(self, board, piece_type):
+        n = self.size
+        return [(i, j) for i in range(n) for j in range(n)
+                if board[i][j] == piece_type and not self.find_liberty(board, i, j)]
+
+    def remove_died_pieces(self, board, piece_type):
+        died_pieces = self.find_died_pieces(board, piece_type)
+        for i, j in died_pieces:
+            board[i][j] = 0
+        return died_pieces
+
+    def valid_place_check(self, i, j, piece_type, ko=True):
+        '''
+        :param ko: boolean, apply the KO rule.
+        :return: boolean indicating whether the placement is valid.
+        '''
+        if not (0 <= i < self.size and 0 <= j < self.size) or self.board[i][j] != 0:
+            return False
+        # Boards only hold ints, so copying the rows is the deepcopy of host.py
+        test_board = [row[:] for row in self.board]
+        test_board[i][j] = piece_type
+        if self.find_liberty(test_board, i, j):
+            return True
+        self.remove_died_pieces(test_board, 3 - piece_type)
+        if not self.find_liberty(test_board, i, j):
+            return False
+        return not (ko and self.died_pieces and self.previous_board == test_board)
+
+    def place(self, i, j, piece_type):
+        '''
+        Play a valid placement, like host.GO.place_chess then remove_died_pieces.
+
+        :return: a list of the captured stones.
+        '''
+        self.previous_board = [row[:] for row in self.board]
+        self.board[i][j] = piece_type
+        self.died_pieces = self.remove_died_pieces(self.board, 3 - piece_type)
+        return self.died_pieces
+
+    def game_end(self, action="MOVE"):
+        return self.n_move >= self.max_move or (action == "PASS" and self.previous_board == self.board)
+
+    def judge_winner(self):
+        count_1 = sum(row.count(1) for row in self.board)
+        count_2 = sum(row.count(2) for row in self.board)
+        if count_1 > count_2 + self.komi:
+            return 1
+        if count_1 < count_2 + self.komi:
+            return 2
+        return 0
+
+
+def check(name, expected, **engines):
+    '''
+    :param name: what is compared.
+    :param expected: value of the reference.
+    :param engines: name -> value of each implementation compared with it.
+    :return: None, raises RulesMismatch when one of them differs.
+    '''
+    for engine, value in engines.items():
+        if value != expected:
+            raise RulesMismatch("{}: reference {} but {} {}".format(name, expected, engine, value))
+
+
+def fuzz_game(rng, go, batch, pass_rate=0.05, capture_bias=0.5):
+    '''
+    Play a random game with every implementation of the rules side by side and compare them
+    after every move.
+
+    Before each move the legal moves and the KO point of the side to move are compared, from
+    a MyGO set up like an agent reading input.txt, from the Chains the search carries from
+    move to move and from the NumPy rules of the MCTS playouts. After it, the captures and
+    the board are compared, and the groups and liberties of those Chains with the ones
+    rebuilt from the board. At the end, the game end and the winner are compared.
+
+    :param rng: random.Random instance the moves are drawn from.
+    :param go: MyGO instance, set to every position of the game.
+    :param batch: BatchGO instance of one game, reset to every position of the game.
+    :param pass_rate: probability of passing instead of placing a stone.
+    :param capture_bias: probability of choosing among the capturing moves when there are some.
+    :return: (list of the moves played, positions checked), raises RulesMismatch with the moves
+             in its second argument at the first difference.
+    '''
+    n = go.size
+    engine = go.engine
+    points = [(i, j) for i in range(n) for j in range(n)]
+    reference = ReferenceGO(n)
+    host = GO(n)
+    host.init_board(n)
+    chains = Chains(engine, engine.empty_position)
+    ko = None  # position the side to move may not recreate, as the search tracks it
+    moves = []
+    positions = 0
+    passes = 0
+    piece_type = 1
+    try:
+        while True:
+            batch.reset(reference.board, reference.previous_board, piece_type, reference.n_move, passes)
+            ended = reference.game_end()
+            check("game end", ended, host=host.game_end(piece_type), batch=bool(batch.done[0]))
+            if ended:
+                break
+            positions += 1
+            legal = [point for point in points if reference.valid_place_check(point[0], point[1], piece_type)]
+            go.set_board(piece_type, reference.previous_board, reference.board)
+            check("position", go.position, chains=chains.position)
+            check("legal moves", legal,
+                  host=[(i, j) for i, j in points if host.valid_place_check(i, j, piece_type, test_check=True)],
+                  my_go=[(i, j) for i, j in points if go.valid_place_check(i, j, piece_type, go.chains)],
+                  generate_moves=[move for move, _, _ in go.generate_moves(go.chains, piece_type, go.prev_position)],
+                  search=[move for move, _, _ in go.generate_moves(chains, piece_type, ko)],
+                  bitboard=[engine.point(index) for index in engine.legal_moves(chains.position, piece_type, ko)],
+                  batch=[point for point, valid in zip(points, batch.legal_mask()[0]) if valid])
+            # KO only bans a point right after a capture of our stones
+            banned = [point for point in points if reference.died_pieces and point not in legal
+                      and reference.valid_place_check(point[0], point[1], piece_type, ko=False)]
+            ko_point = go.ko_point(go.chains, piece_type, go.prev_position)
+            check("KO point", banned, ko_point=[] if ko_point is None else [engine.point(ko_point)])
+
+            if not legal or rng.random() < pass_rate:
+                action = "PASS"
+            else:
+                captures = [point for point in legal if chains.captures(engine.index(*point), piece_type)]
+                action = rng.choice(captures if captures and rng.random() < capture_bias else legal)
+            moves.append(action)
+
+            if action == "PASS":
+                ended = reference.game_end("PASS")
+                check("double pass", ended, host=host.game_end(piece_type, "PASS"))
+                if ended:
+                    break
+                passes += 1
+                reference.previous_board = [row[:] for row in reference.board]
+                host.previous_board = deepcopy(host.board)
+                ko = chains.position
+            else:
+                i, j = action
+                index = engine.index(i, j)
+                expected = sorted(reference.place(i, j, piece_type))
+                boards, valid = batch_place(batch.boards, batch.previous_boards, [index], batch.piece_types)
+                check("valid placement", True, host=host.place_chess(i, j, piece_type), batch=bool(valid[0]))
+                host.died_pieces = host.remove_died_pieces(3 - piece_type)
+                placed = engine.place(chains.position, index, piece_type)
+                ko = chains.position
+                captured = chains.play(index, piece_type)
+                check("captures", expected, host=sorted(host.died_pieces),
+                      chains=[engine.point(k) for k in iter_bits(captured)],
+                      bitboard=[engine.point(k) for k in iter_bits(placed[1])],
+                      batch=[(x, y) for x, y in points if batch.boards[0, x, y] and not boards[0, x, y]])
+                check("board", reference.board, host=host.board, chains=engine.to_board(chains.position),
+                      bitboard=engine.to_board(placed[0]), batch=boards[0].tolist())
+                rebuilt = Chains(engine, chains.position)
+                check("groups and liberties", sorted((rebuilt.stones[root], rebuilt.libs[root]) for root in rebuilt.libs),
+                      chains=sorted((chains.stones[root], chains.libs[root]) for root in chains.libs))
+                passes = 0
+            reference.n_move += 1
+            host.n_move += 1
+            piece_type = 3 - piece_type
+
+        winner = reference.judge_winner()
+        batch.reset(reference.board)
+        check("winner", winner, host=host.judge_winner(), my_go=go.judge_winner(chains.position),
+              batch=int(batch.judge_winner()[0]))
+    except RulesMismatch as e:
+        raise RulesMismatch(e.args[0], moves)
+    return moves, positions
+
+
+def game_seed(seed, index):
+    return (seed * 1000003 + index) & 0xffffffff
+
+
+def fuzz_range(task):
+    '''
+    Fuzz a range of games. Each game draws its moves from its own seed, so a failure replays
+    the same whatever the worker or the order.
+
+    :param task: (seed, first game index, number of games, n, pass rate, capture bias, max failures).
+    :return: (games played, positions checked, list of (game seed, moves, message)).
+    '''
+    seed, first, count, n, pass_rate, capture_bias, max_failures = task
+    go = MyGO(n)
+    batch = BatchGO(n, 1)
+    positions = 0
+    failures = []
+    for index in range(first, first + count):
+        game = game_seed(seed, index)
+        try:
+            _, checked = fuzz_game(random.Random(game), go, batch, pass_rate, capture_bias)
+            positions += checked
+        except RulesMismatch as e:
+            failures.append((game, e.args[1], e.args[0]))
+            if len(failures) >= max_failures:
+                return index - first + 1, positions, failures
+    return count, positions, failures
+
+
+def fuzz(games, n=5, seed=0, workers=None, pass_rate=0.05, capture_bias=0.5, max_failures=10, chunk=200,
+         log=print):
+    '''
+    Fuzz many games on a process pool.
+
+    :param games: number of games.
+    :param n: size of the board n*n
+    :param seed: seed of the run.
+    :param workers: number of processes, None uses every core, 1 fuzzes in this process.
+    :param pass_rate: probability of passing instead of placing a stone.
+    :param capture_bias: probability of choosing among the capturing moves when there are some.
+    :param max_failures: stop after this many games with a difference.
+    :param chunk: games per task.
+    :param log: function called with a progress line after every task, None prints nothing.
+    :return: (games played, positions checked, list of (game seed, moves, message)).
+    '''
+    tasks = [(seed, first, min(chunk, games - first), n, pass_rate, capture_bias, max_failures)
+             for first in range(0, games, chunk)]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    played = positions = 0
+    failures = []
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(fuzz_range, tasks) if pool else map(fuzz_range, tasks)
+        for count, checked, found in results:
+            played += count
+            positions += checked
+            failures.extend(found)
+            if log:
+                seconds = time.perf_counter() - start
+                log("{} games | {} positions | {:.0f} games/s | {} failures".format(
+                    played, positions, played / seconds if seconds > 0 else 0.0, len(failures)))
+            if len(failures) >= max_failures:
+                break
+    finally:
+        if pool:
+            pool.terminate()
+    return played, positions, failures[:max_failures]
+
+
+def formatted(action):
+    return action if action == "PASS" else "{},{}".format(action[0], action[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", "-g", type=int, help="number of random games", default=10000)
+    parser.add_argument("--workers", "-j", type=int, help="number of processes, every core by default", default=None)
+    parser.add_argument("--seed", "-s", type=int, help="seed of the run", default=0)
+    parser.add_argument("--pass-rate", type=float, help="probability of passing", default=0.05)
+    parser.add_argument("--capture-bias", type=float, help="probability of playing a capture when there is one",
+                        default=0.5)
+    parser.add_argument("--max-failures", type=int, help="stop after this many failing games", default=10)
+    parser.add_argument("--record", type=str, help="append the failing games to this game record file",
+                        default=None)
+    parser.add_argument("--logs", type=str, help="write each failing game to a game log for host.py --referee "
+                                                 "in this directory", default=None)
+    args = parser.parse_args()
+
+    played, positions, failures = fuzz(args.games, seed=args.seed, workers=args.workers, pass_rate=args.pass_rate,
+                                       capture_bias=args.capture_bias, max_failures=args.max_failures)
+    for game, moves, message in failures:
+        # A game log for host.py --referee, one move per line
+        log = ["# Game seed {}: {}".format(game, message)] + [formatted(action) for action in moves]
+        print("\n".join(log))
+        if args.logs:
+            os.makedirs(args.logs, exist_ok=True)
+            with open(os.path.join(args.logs, "fuzz-{}.txt".format(game)), 'w') as f:
+                f.write("\n".join(log) + "\n")
+    if failures and args.record:
+        with RecordWriter(args.record) as recorder:
+            for game, moves, message in failures:
+                record = GameRecord("fuzz", "fuzz", game, timed=False)
+                for action in moves:
+                    record.move(action)
+                recorder.write(record)
+    print("{} games, {} positions, {} failures".format(played, positions, len(failures)))
+    sys.exit(1 if failures else 0)
@@ -1,5 +1,7 @@
+import os
 import sys
 import random
+import subprocess
 import timeit
 import math
 import argparse
@@ -8,6 +10,7 @@ from copy import deepcopy
 
 from read import *
 from write import writeNextInput
+from bitboard import Bitboard, iter_bits
 
 
 class GO:
@@ -25,6 +28,7 @@ class GO:
         self.max_move = n * n - 1  # The max movement of a Go game
         self.komi = n / 2  # Komi rule
         self.verbose = False  # Verbose only when there is a manual player
+        self.engine = Bitboard(n)  # Bitboard rules engine for captures and legality
 
     def init_board(self, n):
         '''
@@ -120,12 +124,14 @@ class GO:
         '''
         stack = [(i, j)]  # stack for DFS serach
         ally_members = []  # record allies positions during the search
+        visited = {(i, j)}  # set membership instead of scanning stack and members
         while stack:
             piece = stack.pop()
             ally_members.append(piece)
             neighbor_allies = self.detect_neighbor_ally(piece[0], piece[1])
             for ally in neighbor_allies:
-                if ally not in stack and ally not in ally_members:
+                if ally not in visited:
+                    visited.add(ally)
                     stack.append(ally)
         return ally_members
 
@@ -155,17 +161,8 @@ class GO:
         :param piece_type: 1('X') or 2('O').
         :return: a list containing the dead pieces row and column(row, column).
         '''
-        board = self.board
-        died_pieces = []
-
-        for i in range(len(board)):
-            for j in range(len(board)):
-                # Check if there is a piece at this position:
-                if board[i][j] == piece_type:
-                    # The piece die if it has no liberty
-                    if not self.find_liberty(i, j):
-                        died_pieces.append((i, j))
-        return died_pieces
+        dead = self.engine.dead_stones(self.engine.from_board(self.board), piece_type)
+        return [self.engine.point(index) for index in iter_bits(dead)]
 
     def remove_died_pieces(self, piece_type):
         '''
@@ -244,29 +241,22 @@ class GO:
                 print('Invalid placement. There is already a chess in this position.')
             return False
 
-        # Copy the board for testing
-        test_go = self.copy_board()
-        test_board = test_go.board
-
-        # Check if the place has liberty
-        test_board[i][j] = piece_type
-        test_go.update_board(test_board)
-        if test_go.find_liberty(i, j):
-            return True
+        # Test the placement on bitboards instead of a copy of the game
+        engine = self.engine
+        result = engine.place(engine.from_board(board), engine.index(i, j), piece_type)
 
-        # If not, remove the died pieces of opponent and check again
-        test_go.remove_died_pieces(3 - piece_type)
-        if not test_go.find_liberty(i, j):
+        # Check if the place has liberty after removing the died pieces of opponent
+        if result is None:
             if verbose:
                 print('Invalid placement. No liberty found in this position.')
             return False
 
         # Check special case: repeat placement causing the repeat board state (KO rule)
-        else:
-            if self.died_pieces and self.compare_board(self.previous_board, test_go.board):
-                if verbose:
-                    print('Invalid placement. A repeat move not permitted by the KO rule.')
-                return False
+        test_position, captured = result
+        if captured and self.died_pieces and test_position == engine.from_board(self.previous_board):
+            if verbose:
+                print('Invalid placement. A repeat move not permitted by the KO rule.')
+            return False
         return True
 
     def update_board(self, new_board):
@@ -348,13 +338,14 @@ class GO:
         else:
             return 0
 
-    def play(self, player1, player2, verbose=False):
+    def play(self, player1, player2, verbose=False, recorder=None):
         '''
         The game starts!
 
         :param player1: Player instance.
         :param player2: Player instance.
         :param verbose: whether print input hint and error information
+        :param recorder: record.GameRecord, or record.RecordWriter with a game begun, given every move and the result.
         :return: piece type of winner of the game (0 if it's a tie).
         '''
         self.init_board(self.size)
@@ -379,6 +370,8 @@ class GO:
                         print('The game is a tie.')
                     else:
                         print('The winner is {}'.format('X' if result == 1 else 'O'))
+                if recorder is not None:
+                    recorder.end(result)
                 return result
 
             if verbose:
@@ -386,10 +379,12 @@ class GO:
                 print(player + " makes move...")
 
             # Game continues
+            start = timeit.default_timer()
             if piece_type == 1:
                 action = player1.get_input(self, piece_type)
             else:
                 action = player2.get_input(self, piece_type)
+            seconds = timeit.default_timer() - start
 
             if verbose:
                 player = "X" if piece_type == 1 else "O"
@@ -400,10 +395,35 @@ class GO:
                 if not self.place_chess(action[0], action[1], piece_type):
                     if verbose:
                         self.visualize_board()
+                    # Only a manual player may retry, an agent loses like in judge()
+                    current = player1 if piece_type == 1 else player2
+                    if current.type != 'manual':
+                        if verbose:
+                            print('The winner is {}'.format('X' if 3 - piece_type == 1 else 'O'))
+                        if recorder is not None:
+                            recorder.move(action, seconds)
+                            recorder.end(3 - piece_type)
+                        return 3 - piece_type
                     continue
 
+                if recorder is not None:
+                    recorder.move(action, seconds)
                 self.died_pieces = self.remove_died_pieces(3 - piece_type)  # Remove the dead pieces of opponent
             else:
+                if recorder is not None:
+                    recorder.move(action, seconds)
+                # Two players all pass the move, checked before the previous board is overwritten
+                if self.game_end(piece_type, action):
+                    result = self.judge_winner()
+                    if verbose:
+                        print('Game ended.')
+                        if result == 0:
+                            print('The game is a tie.')
+                        else:
+                            print('The winner is {}'.format('X' if result == 1 else 'O'))
+                    if recorder is not None:
+                        recorder.end(result)
+                    return result
                 self.previous_board = deepcopy(self.board)
 
             if verbose:
@@ -414,25 +434,23 @@ class GO:
             self.X_move = not self.X_move  # Players take turn
 
 
-def judge(n_move, verbose=False):
-    N = 5
-
-    piece_type, previous_board, board = readInput(N)
-    go = GO(N)
-    go.verbose = verbose
-    go.set_board(piece_type, previous_board, board)
-    go.n_move = n_move
-    try:
-        action, x, y = readOutput()
-    except:
-        print("output.txt not found or invalid format")
-        sys.exit(3 - piece_type)
+def adjudicate(go, piece_type, action, x, y, verbose=False):
+    '''
+    Apply one move to a game and decide whether it ends, with the rules of judge().
 
+    :param go: GO instance, n_move already counting this move.
+    :param piece_type: 1('X') or 2('O'), the player moving.
+    :param action: "MOVE" or "PASS", as returned by readOutput().
+    :param x: row of the move.
+    :param y: column of the move.
+    :param verbose: boolean, print the board and the result.
+    :return: None if the game goes on, else the exit code of judge(): the winner (0 if it's a tie).
+    '''
     if action == "MOVE":
         if not go.place_chess(x, y, piece_type):
             print('Game end.')
             print('The winner is {}'.format('X' if 3 - piece_type == 1 else 'O'))
-            sys.exit(3 - piece_type)
+            return 3 - piece_type
 
         go.died_pieces = go.remove_died_pieces(3 - piece_type)
 
@@ -448,21 +466,146 @@ def judge(n_move, verbose=False):
                 print('The game is a tie.')
             else:
                 print('The winner is {}'.format('X' if result == 1 else 'O'))
+        return result
+
+    if action == "PASS":
+        go.previous_board = go.board
+        go.died_pieces = []
+    return None
+
+
+def judge(n_move, verbose=False):
+    N = 5
+
+    piece_type, previous_board, board = readInput(N)
+    go = GO(N)
+    go.verbose = verbose
+    go.set_board(piece_type, previous_board, board)
+    go.n_move = n_move
+    try:
+        action, x, y = readOutput()
+    except:
+        print("output.txt not found or invalid format")
+        sys.exit(3 - piece_type)
+
+    result = adjudicate(go, piece_type, action, x, y, verbose)
+    if result is not None:
         sys.exit(result)
 
     piece_type = 2 if piece_type == 1 else 1
 
-    if action == "PASS":
-        go.previous_board = go.board
     writeNextInput(piece_type, go.previous_board, go.board)
 
     sys.exit(0)
 
 
+def referee(next_move, n=5, verbose=False, recorder=None):
+    '''
+    Adjudicate a whole game in one process, with the rules and the exit codes of judge().
+
+    judge() runs once per move and passes the game on through input.txt; here the same GO
+    instance goes from the empty board to the end of the game.
+
+    :param next_move: function (go, piece_type) -> ("MOVE" or "PASS", x, y) giving the move of
+                      the player to move, raising OSError, ValueError, IndexError or StopIteration
+                      when there is no valid one.
+    :param n: size of the board n*n
+    :param verbose: boolean, print the board after every move and the result.
+    :param recorder: record.GameRecord, or record.RecordWriter with a game begun, given every move
+                     with the time next_move took and the result.
+    :return: the winner (0 if it's a tie), as judge() exits with at the end of the game.
+    '''
+    go = GO(n)
+    go.verbose = verbose
+    go.init_board(n)
+    piece_type = 1
+    while True:
+        start = timeit.default_timer()
+        try:
+            action, x, y = next_move(go, piece_type)
+        except (OSError, ValueError, IndexError, StopIteration):
+            print("No valid move from {}".format('X' if piece_type == 1 else 'O'))
+            if recorder is not None:
+                recorder.move(None, timeit.default_timer() - start)
+                recorder.end(3 - piece_type)
+            return 3 - piece_type
+        if recorder is not None:
+            recorder.move("PASS" if action == "PASS" else (x, y), timeit.default_timer() - start)
+        go.n_move += 1
+        result = adjudicate(go, piece_type, action, x, y, verbose)
+        if result is not None:
+            if recorder is not None:
+                recorder.end(result)
+            return result
+        piece_type = 2 if piece_type == 1 else 1
+
+
+def log_moves(lines):
+    '''
+    Moves of a game log for referee(): one move per line in the format of output.txt,
+    "x,y" or "PASS", Black first. Empty lines and lines starting with # are skipped.
+
+    :param lines: iterable of lines, e.g. an open file.
+    :return: function for referee().
+    '''
+    actions = (parseOutput(line) for line in lines if line.strip() and not line.startswith('#'))
+    return lambda go, piece_type: next(actions)
+
+
+def agent_moves(commands, input_path="input.txt", output_path="output.txt"):
+    '''
+    Moves of two agents for referee(), run like build.sh does: input.txt is written, the
+    agent's command is run in a shell and output.txt is read.
+
+    :param commands: dict piece type -> shell command of the agent.
+    :param input_path: file the agents read.
+    :param output_path: file the agents write.
+    :return: function for referee().
+    '''
+    def next_move(go, piece_type):
+        writeNextInput(piece_type, go.previous_board, go.board, input_path)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        # Agents print to stderr, like build.sh does with their output
+        subprocess.run(commands[piece_type], shell=True, stdout=sys.stderr)
+        return readOutput(output_path)
+
+    return next_move
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--move", "-m", type=int, help="number of total moves", default=0)
     parser.add_argument("--verbose", "-v", type=bool, help="print board", default=False)
+    parser.add_argument("--referee", "-r", type=str, help="adjudicate a whole game log, one move per line "
+                                                          "like output.txt, - for stdin", default=None)
+    parser.add_argument("--black", "-b", type=str, help="command of the Black agent, to referee a whole game "
+                                                        "against --white", default=None)
+    parser.add_argument("--white", "-w", type=str, help="command of the White agent", default=None)
+    parser.add_argument("--record", type=str, help="append the game refereed to this game record file",
+                        default=None)
     args = parser.parse_args()
 
+    recorder = None
+    if args.record is not None:
+        if args.referee is None and args.black is None and args.white is None:
+            parser.error("--record goes with --referee or --black and --white")
+        # Imported here, as record imports this module
+        from record import RecordWriter
+        recorder = RecordWriter(args.record)
+    if args.black is not None or args.white is not None:
+        if args.black is None or args.white is None:
+            parser.error("--black and --white go together")
+        if recorder is not None:
+            recorder.begin(args.black, args.white)
+        sys.exit(referee(agent_moves({1: args.black, 2: args.white}), verbose=args.verbose, recorder=recorder))
+    if args.referee is not None:
+        if recorder is not None:
+            # Moves of a log take no time to read
+            recorder.begin(args.referee, args.referee, timed=False)
+        if args.referee == "-":
+            sys.exit(referee(log_moves(sys.stdin), verbose=args.verbose, recorder=recorder))
+        with open(args.referee, 'r') as f:
+            result = referee(log_moves(f), verbose=args.verbose, recorder=recorder)
+        sys.exit(result)
     judge(args.move, args.verbose)
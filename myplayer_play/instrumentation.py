@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: instrumentation
+# Description: Per-search statistics written as JSON lines, and a profiler sampling some searches
+# TodoList:
+
+import cProfile
+import json
+import sys
+import time
+
+SECTIONS = ('movegen', 'captures', 'evaluation')  # captures is the part of movegen spent in Chains.captures
+
+
+class SearchStats:
+    def __init__(self, path=None):
+        '''
+        Records what each move of a MyPlayer cost and writes one JSON object per move.
+
+        A record holds the move chosen and where it came from (search, book or endgame), the
+        nodes, cut-offs and time of every iterative deepening iteration, the effective
+        branching factor between iterations, the time spent generating moves, detecting
+        captures and evaluating leaves, the hit rates of the transposition table and of
+        the position cache, and the nodes per second. For a search split across worker
+        processes, the counters and the timings are the sums over the workers.
+
+        :param path: file the records are appended to, None or "-" for stderr.
+        '''
+        self.path = path
+        self.record = None
+        self.timings = None
+        self.started = 0.0
+        self.search_started = 0.0
+        self.counters = None
+
+    def start(self, piece_type, move):
+        '''
+        Begin the record of a move.
+
+        :param piece_type: side to move.
+        :param move: number of moves played so far.
+        :return: dict of section -> seconds, for Minimax to add its timings to.
+        '''
+        self.started = time.perf_counter()
+        self.timings = dict.fromkeys(SECTIONS, 0.0)
+        self.record = {'piece_type': piece_type, 'move': move, 'iterations': []}
+        self.counters = None
+        return self.timings
+
+    def search(self, table):
+        '''
+        Note that the move is searched, so finish() reports the table and cache hit rates.
+
+        :param table: TranspositionTable of the player, ready for the search.
+        :return: None.
+        '''
+        self.search_started = time.perf_counter()
+        self.counters = self.table_counters(table)
+
+    def table_counters(self, table):
+        counters = {'table': (table.probes, table.hits)}
+        if table.backing is not None:
+            counters['cache'] = (table.backing.probes, table.backing.hits)
+        return counters
+
+    def iteration(self, depth, minimax):
+        '''
+        Add a finished iterative deepening iteration.
+
+        :param depth: depth of the iteration.
+        :param minimax: Minimax instance of the search, or parallel.SearchCounters, its counters are totals
+                        since the move started.
+        :return: None.
+        '''
+        iterations = self.record['iterations']
+        nodes, cutoffs, expanded = minimax.nodes, minimax.cutoffs, minimax.expanded
+        if iterations:
+            nodes -= sum(it['nodes'] for it in iterations)
+            cutoffs -= sum(it['cutoffs'] for it in iterations)
+            expanded -= sum(it['expanded'] for it in iterations)
+        iterations.append({'depth': depth, 'nodes': nodes, 'cutoffs': cutoffs, 'expanded': expanded,
+                           'seconds': round(time.perf_counter() - self.started, 6)})
+
+    def finish(self, step, source, table=None, minimax=None, value=None, depth=None, endgame_nodes=None):
+        '''
+        Complete the record of a move and write it.
+
+        :param step: move played, (i, j) or "PASS".
+        :param source: "search", "book", "endgame" or "forced".
+        :param table: TranspositionTable of the player, read if search() was called.
+        :param minimax: Minimax instance of the search, or parallel.SearchCounters of a parallel one,
+                        None if there was none.
+        :param value: value of the move for the player, None if unknown.
+        :param depth: last completed depth of the search.
+        :param endgame_nodes: nodes visited by the EndgameSolver, None if it did not run.
+        :return: dict, the record written.
+        '''
+        record = self.record
+        now = time.perf_counter()
+        record.update({'step': step if step == "PASS" else list(step), 'source': source, 'value': value,
+                       'depth': depth, 'seconds': round(now - self.started, 6)})
+        if minimax is not None:
+            nodes = minimax.nodes
+            seconds = now - self.search_started
+            record.update({
+                'nodes': nodes,
+                'search_seconds': round(seconds, 6),
+                'nodes_per_second': round(nodes / seconds) if seconds > 0 else None,
+                'cutoff_rate': round(minimax.cutoffs / minimax.expanded, 4) if minimax.expanded else None,
+                'researches': minimax.researches,
+            })
+            iterations = record['iterations']
+            # Effective branching factor: growth of the tree from one iteration to the next
+            record['branching'] = [round(b['nodes'] / a['nodes'], 3)
+                                   for a, b in zip(iterations, iterations[1:]) if a['nodes']]
+            record['timings'] = {section: round(spent, 6) for section, spent in self.timings.items()}
+        if endgame_nodes is not None:
+            record['endgame_nodes'] = endgame_nodes
+        tables = getattr(minimax, 'tables', None)
+        if tables is not None:
+            # A parallel search probes the tables of its workers, see parallel.SearchCounters
+            for name, (probes, hits) in tables.items():
+                record[name] = {'probes': probes, 'hits': hits,
+                                'hit_rate': round(hits / probes, 4) if probes else None}
+        elif self.counters is not None:
+            for name, (probes, hits) in self.table_counters(table).items():
+                probes -= self.counters[name][0]
+                hits -= self.counters[name][1]
+                record[name] = {'probes': probes, 'hits': hits,
+                                'hit_rate': round(hits / probes, 4) if probes else None}
+        self.write(record)
+        self.record = None
+        return record
+
+    def write(self, record):
+        line = json.dumps(record, sort_keys=True)
+        if self.path is None or self.path == "-":
+            sys.stderr.write(line + "\n")
+            sys.stderr.flush()
+        else:
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+
+
+class SampledProfiler:
+    def __init__(self, path, every=10):
+        '''
+        Runs cProfile on one search out of every few, so its overhead stays off most moves.
+
+        The profiles of the sampled searches are added up and dumped to a pstats file after
+        each of them, e.g. python -m pstats profile.out.
+
+        :param path: pstats file.
+        :param every: profile one search out of this many, starting with the first.
+        '''
+        self.path = path
+        self.every = every
+        self.profile = cProfile.Profile()
+        self.searches = 0
+        self.active = False
+
+    def start(self):
+        '''
+        Start profiling if this search is sampled.
+
+        :return: boolean, whether the search is profiled.
+        '''
+        self.active = self.searches % self.every == 0
+        self.searches += 1
+        if self.active:
+            self.profile.enable()
+        return self.active
+
+    def stop(self):
+        if self.active:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
+            self.active = False
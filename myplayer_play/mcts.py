@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: mcts
+# Description: Monte Carlo Tree Search (UCT) player with bitboard playouts
+# TodoList:
+
+import math
+import random
+import time
+
+from bitboard import iter_bits
+from my_player3 import MyGO, from_host
+
+PASS = -1  # point index standing for a pass
+
+
+class TreeNode:
+    __slots__ = ('position', 'ko', 'type', 'move', 'passes', 'parent', 'step', 'children', 'untried',
+                 'visits', 'wins')
+
+    def __init__(self, position, ko, piece_type, move, passes, parent=None, step=None):
+        self.position = position  # (black, white) bitboards
+        self.ko = ko  # position the side to move may not recreate (KO rule)
+        self.type = piece_type  # side to move
+        self.move = move  # number of moves played so far
+        self.passes = passes  # consecutive passes that led here
+        self.parent = parent
+        self.step = step  # point index played to get here, PASS for a pass
+        self.children = []
+        self.untried = None  # moves not expanded yet, listed on the first visit
+        self.visits = 0
+        self.wins = 0.0  # for the player who moved into this node, a tie counts half
+
+
+class MCTSPlayer:
+    def __init__(self, time_limit=1.0, playouts=None, batch=1, exploration=1.4, seed=None, vectorized=False):
+        '''
+        UCT search with random playouts on bitboards.
+
+        The tree is kept between consecutive moves: when the new position is a grandchild of
+        the last root, the search continues from it.
+
+        :param time_limit: seconds per move, None to only count playouts.
+        :param playouts: number of playouts per move, None to only use the time limit.
+        :param batch: playouts run from every newly expanded node.
+        :param exploration: UCT exploration constant.
+        :param seed: seed of the playouts, None leaves them unseeded.
+        :param vectorized: run the batch of playouts together on batch.BatchGO (needs NumPy).
+        '''
+        self.type = 'mcts'
+        self.time_limit = time_limit
+        self.playouts = playouts
+        self.batch = batch
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.root = None
+        self.last_playouts = 0
+        self.batch_go = None
+        if vectorized:
+            from batch import BatchGO
+            self.batch_go = BatchGO
+
+    def get_input(self, go, piece_type, board=None):
+        if not isinstance(go, MyGO):
+            # Called by host.GO.play with the host's game, e.g. from the arena
+            go = from_host(go, piece_type)
+        self.go = go
+        self.engine = go.engine
+        root = self.reuse_root(go, piece_type)
+        deadline = None if self.time_limit is None else time.time() + self.time_limit
+        count = 0
+        while True:
+            if self.playouts is not None and count >= self.playouts:
+                break
+            if deadline is not None and not count & 15 and time.time() > deadline:
+                break
+            count += self.iterate(root)
+        self.last_playouts = count
+
+        if not root.children:
+            return "PASS"
+        best = max(root.children, key=lambda child: child.visits)
+        # Keep the chosen subtree for the next move
+        self.root = best
+        best.parent = None
+        if best.step == PASS:
+            return "PASS"
+        return self.engine.point(best.step)
+
+    def reuse_root(self, go, piece_type):
+        # Find the current position among the opponent's replies to our last move
+        if self.root is not None:
+            for child in self.root.children:
+                if child.position == go.position and child.type == piece_type and child.ko == go.prev_position:
+                    child.parent = None
+                    return child
+        # An unchanged board means the opponent passed (or nobody has played yet), and passing
+        # now ends the game like in host.GO.game_end; Minimax checks ko == board the same way
+        passes = 1 if go.prev_position == go.position else 0
+        return TreeNode(go.position, go.prev_position, piece_type, go.move, passes)
+
+    def terminal(self, node):
+        return node.move >= self.go.max_move or node.passes >= 2
+
+    def iterate(self, root):
+        '''
+        One selection, expansion, playout and backpropagation step.
+
+        :param root: TreeNode to search from.
+        :return: number of playouts run.
+        '''
+        node = root
+        # Selection
+        while not self.terminal(node) and node.untried is not None and not node.untried:
+            node = self.select(node)
+        # Expansion
+        if not self.terminal(node):
+            if node.untried is None:
+                node.untried = self.engine.legal_moves(node.position, node.type, node.ko) + [PASS]
+            step = node.untried.pop(self.rng.randrange(len(node.untried)))
+            node = self.expand(node, step)
+        # Playouts
+        if self.batch_go is not None:
+            winners = self.batch_playout(node)
+        else:
+            winners = [self.playout(node) for _ in range(self.batch)]
+        for winner in winners:
+            # Backpropagation
+            current = node
+            while current is not None:
+                current.visits += 1
+                if winner == 0:
+                    current.wins += 0.5
+                elif winner == 3 - current.type:
+                    current.wins += 1
+                current = current.parent
+        return self.batch
+
+    def select(self, node):
+        log_visits = math.log(node.visits)
+        c = self.exploration
+        return max(node.children,
+                   key=lambda child: child.wins / child.visits + c * math.sqrt(log_visits / child.visits))
+
+    def expand(self, node, step):
+        if step == PASS:
+            child = TreeNode(node.position, node.position, 3 - node.type, node.move + 1, node.passes + 1, node, step)
+        else:
+            position = self.engine.place(node.position, step, node.type)[0]
+            child = TreeNode(position, node.position, 3 - node.type, node.move + 1, 0, node, step)
+        node.children.append(child)
+        return child
+
+    def playout(self, node):
+        '''
+        Play random moves to the end of the game, never filling one's own eyes.
+
+        :param node: TreeNode to start from.
+        :return: piece type of the winner (0 if it's a tie).
+        '''
+        engine = self.engine
+        rng = self.rng
+        neighbor_masks = engine.neighbor_masks
+        position, ko, piece_type = node.position, node.ko, node.type
+        move, passes = node.move, node.passes
+        max_move = self.go.max_move
+        while move < max_move and passes < 2:
+            own = position[piece_type - 1]
+            points = [index for index in iter_bits(engine.empty(position)) if neighbor_masks[index] & ~own]
+            played = None
+            while points:
+                k = rng.randrange(len(points))
+                points[k], points[-1] = points[-1], points[k]
+                result = engine.place(position, points.pop(), piece_type)
+                if result is not None and not (result[1] and result[0] == ko):
+                    played = result[0]
+                    break
+            ko = position
+            if played is None:
+                passes += 1
+            else:
+                position = played
+                passes = 0
+            piece_type = 3 - piece_type
+            move += 1
+        return self.go.judge_winner(position)
+
+    def batch_playout(self, node):
+        '''
+        Run the whole batch of playouts from a node at once on NumPy arrays.
+
+        :param node: TreeNode to start from.
+        :return: list of the piece types of the winners (0 for a tie).
+        '''
+        go = self.batch_go(self.go.size, self.batch, self.go.komi, self.go.max_move, self.rng.getrandbits(32))
+        go.reset(self.engine.to_board(node.position), self.engine.to_board(node.ko), node.type, node.move, node.passes)
+        return go.run().tolist()
@@ -1,7 +1,17 @@
-import random
-import sys
-from copy import deepcopy
-import cProfile
+import argparse
+import os
+import time
+
+import daemon
+from book import OpeningBook
+from cache import CACHE_PATH, PositionCache
+from endgame import TABLEBASE_PATH, EndgameSolver
+
+from bitboard import Bitboard, Chains, iter_bits, popcount
+from transposition import Zobrist, TranspositionTable, EXACT, LOWER, UPPER, RESOLVED
+from evaluation import Evaluator
+from instrumentation import SampledProfiler, SearchStats
+from ordering import MoveOrdering
 
 
 class MyGO():
@@ -11,9 +21,13 @@ class MyGO():
         self.move = 0
         self.max_move = 24
         self.dead = []
+        self.engine = Bitboard(size)
+        self.zobrist = Zobrist(size, self.max_move)
+        self.evaluator = Evaluator(self.engine)
 
     def set_board(self, type, prev_board, board):
-        # Adapted from host.py
+        # Adapted from host.py, which only sets a board once per GO: a MyGO may be given many
+        self.dead = []
         for i in range(self.size):
             for j in range(self.size):
                 if prev_board[i][j] == type and board[i][j] != type:
@@ -22,198 +36,113 @@ class MyGO():
         # self.piece_type = piece_type
         self.prev_board = prev_board
         self.board = board
+        self.prev_position = self.engine.from_board(prev_board)
+        self.position = self.engine.from_board(board)
+        self.chains = Chains(self.engine, self.position)
 
-    def detect_neighbor(self, i, j, board):
-        # Adapted from host.py
-        neighbors = []
-        # Detect borders and add neighbor coordinates
-        if i > 0: neighbors.append((i - 1, j))
-        if i < len(board) - 1: neighbors.append((i + 1, j))
-        if j > 0: neighbors.append((i, j - 1))
-        if j < len(board) - 1: neighbors.append((i, j + 1))
-        return neighbors
-
-    def detect_neighbor_ally(self, i, j, board):
-        # Adapted from host.py
-        neighbors = self.detect_neighbor(i, j, board)  # Detect neighbors
-        group_allies = []
-        # Iterate through neighbors
-        for piece in neighbors:
-            # Add to allies list if having the same color
-            if board[piece[0]][piece[1]] == board[i][j]:
-                group_allies.append(piece)
-        return group_allies
-
-    def ally_dfs(self, i, j, board):
-        # Adapted from host.py
-        stack = [(i, j)]  # stack for DFS serach
-        ally_members = []  # record allies positions during the search
-        while stack:
-            piece = stack.pop()
-            ally_members.append(piece)
-            neighbor_allies = self.detect_neighbor_ally(piece[0], piece[1], board)
-            for ally in neighbor_allies:
-                if ally not in stack and ally not in ally_members:
-                    stack.append(ally)
-        return ally_members
-
-    def find_liberty(self, i, j, board):
-        # Adapted from host.py
-        ally_members = self.ally_dfs(i, j, board)
-        # if board[0][0] == 2 and board[1][0] == 1 and board[0][1] == 1:
-        # print(i, j)
-        # print(ally_members)
-        # go.visualize_board(board)
-        for member in ally_members:
-            neighbors = self.detect_neighbor(member[0], member[1], board)
-            for piece in neighbors:
-                # If there is empty space around a piece, it has liberty
-                if board[piece[0]][piece[1]] == 0:
-                    return True
-        # If none of the pieces in a allied group has an empty space, it has no liberty
-        return False
-
-    def find_died_pieces(self, piece_type, board):
-        # Adapted from host.py
-        died_pieces = []
-
-        for i in range(len(board)):
-            for j in range(len(board)):
-                # Check if there is a piece at this position:
-                if board[i][j] == piece_type:
-                    # The piece die if it has no liberty
-                    if not self.find_liberty(i, j, board):
-                        died_pieces.append((i, j))
-        return died_pieces
-
-    def remove_died_pieces(self, piece_type, board):
-        # Adapted from host.py
-        died_pieces = self.find_died_pieces(piece_type, board)
-        if not died_pieces:
-            return []
-        # print("died: ", died_pieces)
-        for piece in died_pieces:
-            board[piece[0]][piece[1]] = 0
-        # go.visualize_board(board)
-        return died_pieces
-
-    def place(self, i, j, piece_type, board):
-        board = deepcopy(board)
-        board[i][j] = piece_type
-        self.remove_died_pieces(3 - piece_type, board)
-        # if board[0][1] == 1 and board[1][0] == 1:
-        #     print("place")
-        #     go.visualize_board(board)
-        return board
-
-    def compare_board(self, board1, board2):
-        # Adapted from host.py
-        for i in range(self.size):
-            for j in range(self.size):
-                if board1[i][j] != board2[i][j]:
-                    return False
-        return True
+    def place(self, i, j, piece_type, chains):
+        # The child only updates the groups around (i, j) instead of copying the board
+        child = chains.copy()
+        child.play(self.engine.index(i, j), piece_type)
+        return child
 
-    def valid_place_check(self, i, j, piece_type, board):
+    def valid_place_check(self, i, j, piece_type, chains):
         # Adapted from host.py
-        verbose = False
-        # if test_check:
-        #     verbose = False
         # Check if the place is in the board range
-        if not (i >= 0 and i < len(board)):
-            if verbose:
-                print(('Invalid placement. row should be in the range 1 to {}.').format(len(board) - 1))
-            return False
-        if not (j >= 0 and j < len(board)):
-            if verbose:
-                print(('Invalid placement. column should be in the range 1 to {}.').format(len(board) - 1))
+        if not (0 <= i < self.size and 0 <= j < self.size):
             return False
-
+        index = self.engine.index(i, j)
+        black, white = chains.position
+        bit = 1 << index
         # Check if the place already has a piece
-        if board[i][j] != 0:
-            if verbose:
-                print('Invalid placement. There is already a chess in this position.')
+        if (black | white) & bit:
             return False
 
-        # Copy the board for testing
-        test_go = deepcopy(self)
-        test_board = deepcopy(board)
-
-        # Check if the place has liberty
-        test_board[i][j] = piece_type
-        test_go.board = test_board
-        if test_go.find_liberty(i, j, test_board):
-            return True
-
-        # If not, remove the died pieces of opponent and check again
-        test_go.remove_died_pieces(3 - piece_type, board)
-        if not test_go.find_liberty(i, j, test_board):
-            if verbose:
-                print('Invalid placement. No liberty found in this position.')
+        # Captures and liberties only depend on the groups next to (i, j)
+        captured = chains.captures(index, piece_type)
+        if chains.is_suicide(index, piece_type, captured):
             return False
 
-        # Check special case: repeat placement causing the repeat board state (KO rule)
-        else:
-            if self.died_pieces and self.compare_board(self.previous_board, test_go.board):
-                if verbose:
-                    print('Invalid placement. A repeat move not permitted by the KO rule.')
-                return False
+        # KO only applies when one of our stones was just captured
+        if captured and self.dead:
+            return self.engine.apply(chains.position, index, piece_type, captured) != self.prev_position
         return True
 
-    def is_territory(self, piece_type, i, j, board):
-        isEmpty = False
-        up = False
-        down = False
-        left = False
-        right = False
-        if board[i][j] == 0: isEmpty = True
-        if (i > 0 and board[i - 1][j] == piece_type) or i == 0:
-            up = True
-        if (i < len(board) - 1 and board[i + 1][j] == piece_type) or i == len(board) - 1:
-            down = True
-        if (j > 0 and board[i][j - 1] == piece_type) or j == 0:
-            left = True
-        if (j < len(board) - 1 and board[i][j + 1] == piece_type) or j == len(board) - 1:
-            right = True
-        return isEmpty and up and down and left and right
-
-    def has_neighbour(self, i, j, board):
-        empty = 0
-        for x in range(self.size):
-            for y in range(self.size):
-                if board[x][y] == 0:
-                    empty += 1
-        # print(empty)
-        if empty < 14:
-            return True
-        neighbours = self.detect_neighbor(i, j, board)
-        if i > 0 and j > 0:
-            neighbours.append((i-1, j-1))
-        if i > 0 and j < len(board)-1:
-            neighbours.append((i-1, j+1))
-        if i < len(board)-1 and j > 0:
-            neighbours.append((i+1, j-1))
-        if i < len(board)-1 and j < len(board)-1:
-            neighbours.append((i+1, j+1))
-        # print(i, j, neighbours)
-        for n in neighbours:
-            if board[n[0]][n[1]] > 0:
-                return True
-        return False
-
-    def reward(self, piece_type, board):
-        score = 0
-        for i in range(self.size):
-            for j in range(self.size):
-                if board[i][j] == piece_type or self.is_territory(piece_type, i, j, board):
-                    score += 1
-        # Implement Benson's unconditional live
-
-        # print("Score:", score, "\n")
-        # go.visualize_board(board)
-        return score
-
-    def visualize_board(self, board):
+    def generate_moves(self, chains, piece_type, ko_position=None, candidates=None, order=None, timings=None):
+        # Legality, captures and the child position in one pass, so nothing is computed twice
+        # ko_position is the position before the opponent's last move, which may not be repeated
+        # order is a list of the candidate point indexes to try, in board order by default
+        # timings is a dict the seconds spent detecting captures are added to, see instrumentation.py
+        engine = self.engine
+        if order is None:
+            if candidates is None:
+                candidates = engine.empty(chains.position)
+            order = iter_bits(candidates)
+        for index in order:
+            if timings is None:
+                captured = chains.captures(index, piece_type)
+            else:
+                start = time.perf_counter()
+                captured = chains.captures(index, piece_type)
+                timings['captures'] += time.perf_counter() - start
+            if chains.is_suicide(index, piece_type, captured):
+                continue
+            if captured and ko_position is not None:
+                if engine.apply(chains.position, index, piece_type, captured) == ko_position:
+                    continue
+            child = chains.copy()
+            child.play(index, piece_type)
+            yield engine.point(index), child, captured
+
+    def ko_point(self, chains, piece_type, ko_position):
+        # The point where piece_type may not play because it would repeat ko_position
+        return self.engine.ko_point(chains.position, ko_position, piece_type)
+
+    def candidates(self, position):
+        # Empty points next to a stone, diagonals included, once the board has filled up a little
+        engine = self.engine
+        empty = engine.empty(position)
+        if popcount(empty) < 14:
+            return empty
+        near = 0
+        for index in iter_bits(position[0] | position[1]):
+            near |= engine.around_masks[index]
+        return empty & near
+
+    def settled(self, chains, piece_type, moves):
+        # Empty points in the vital regions of the opponent's unconditionally alive groups (Benson)
+        # where a stone only loses a move: the opponent can fill the other empty points of the region
+        # and capture it before the game ends. Stones still on the board at max_move count, so a region
+        # with more empty points than the opponent has replies left is not settled.
+        # moves: moves left in the game, this one included
+        engine = self.engine
+        empty = engine.empty(chains.position)
+        vital = self.evaluator.life(chains, 3 - piece_type)[1]
+        replies = moves // 2  # the opponent plays every other move after this one
+        settled = 0
+        while vital:
+            region = engine.group(vital, (vital & -vital).bit_length() - 1)
+            vital &= ~region
+            if popcount(region & empty) - 1 <= replies:
+                settled |= region & empty
+        return settled
+
+    def reward(self, piece_type, chains):
+        # Weighted features of the position, see evaluation.py
+        return self.evaluator.evaluate(chains, piece_type)
+
+    def judge_winner(self, position):
+        # Same as host.GO.judge_winner: stones only, komi for 'O'
+        cnt_1 = popcount(position[0])
+        cnt_2 = popcount(position[1])
+        if cnt_1 > cnt_2 + self.komi:
+            return 1
+        elif cnt_1 < cnt_2 + self.komi:
+            return 2
+        return 0
+
+    def visualize_board(self, position):
+        board = self.engine.to_board(position)
         print('-' * len(board) * 2)
         for i in range(len(board)):
             for j in range(len(board)):
@@ -227,153 +156,507 @@ class MyGO():
         print('-' * len(board) * 2)
 
 
+def from_host(host_go, piece_type):
+    # MyGO for the position of a host.GO game
+    go = MyGO(host_go.size)
+    go.set_board(piece_type, host_go.previous_board, host_go.board)
+    go.move = host_go.n_move
+    return go
+
+
 class Node:
-    def __init__(self, board, type, step, next_step=None):
-        self.board = board
+    def __init__(self, chains, type, step, next_step=None, ko=None, board_hash=0, move=0):
+        self.chains = chains
+        self.board = chains.position
+        self.ko = ko  # position before the opponent's last move, forbidden by the KO rule
+        self.board_hash = board_hash  # Zobrist hash of the stones
+        self.move = move
         self.type = type
         self.step = step
         self.next_step = next_step
         self.reward = -1000
 
 
+WIN_SCORE = 500  # value of a finished game won, beyond any MyGO.reward
+
+
+class SearchTimeout(Exception):
+    pass
+
+
 class Minimax:
-    def __init__(self, go, root):
+    def __init__(self, go, root, table=None, deadline=None, ordering=None, timings=None):
         self.go = go
         self.root = root
+        self.table = table
+        self.ordering = ordering
+        self.deadline = deadline  # time.time() at which the search is abandoned
+        self.timings = timings  # section -> seconds, from SearchStats.start, None to not time anything
+        self.nodes = 0
+        self.expanded = 0  # nodes whose children were searched
+        self.cutoffs = 0
+        self.researches = 0
+        self.horizon = 0  # leaves cut off by depth rather than by the end of the game
+
+    def key(self, node):
+        # (table key, symmetry of the position the key was taken from)
+        go = self.go
+        ko_point = go.ko_point(node.chains, node.type, node.ko)
+        return go.zobrist.key(node.board_hash, node.type, ko_point, node.move, node.board, node.ko == node.board)
+
+    def to_table(self, step, symmetry):
+        # Moves are stored in the frame of the symmetric image that gave the key
+        if step is None or step == "PASS" or not symmetry:
+            return step
+        engine = self.go.engine
+        return engine.point(engine.symmetries[symmetry][engine.index(step[0], step[1])])
+
+    def from_table(self, step, symmetry):
+        if step is None or step == "PASS" or not symmetry:
+            return step
+        engine = self.go.engine
+        return engine.point(engine.inverse_symmetries[symmetry][engine.index(step[0], step[1])])
+
+    def evaluate(self, node):
+        # Reward of the root player, seen from the side to move
+        reward = self.go.reward(self.root.type, node.chains)
+        return reward if node.type == self.root.type else -reward
+
+    def terminal_value(self, node):
+        # Final result of the game for the root player, seen from the side to move
+        winner = self.go.judge_winner(node.board)
+        if winner == 0:
+            value = 0
+        else:
+            value = WIN_SCORE if winner == self.root.type else -WIN_SCORE
+        return value if node.type == self.root.type else -value
 
-    def max_value(self, depth, cur_node):
+    def children(self, cur_node, order):
+        # Placements in the given order, then the pass
+        go = self.go
         type = cur_node.type
-        board = cur_node.board
+        for (i, j), new_chains, captured in go.generate_moves(cur_node.chains, type, cur_node.ko, order=order,
+                                                              timings=self.timings):
+            new_hash = go.zobrist.update(cur_node.board_hash, go.engine.index(i, j), type, captured)
+            yield (i, j), Node(new_chains, 3 - type, (i, j), ko=cur_node.board, board_hash=new_hash,
+                               move=cur_node.move + 1), captured
+        # A pass right after the opponent's pass ends the game (host.GO.game_end), no child then
+        if cur_node.ko == cur_node.board:
+            yield "PASS", None, 0
+        else:
+            yield "PASS", Node(cur_node.chains, 3 - type, "PASS", ko=cur_node.board, board_hash=cur_node.board_hash,
+                               move=cur_node.move + 1), 0
+
+    def timed(self, generator, section):
+        # Add the time spent inside a generator, but not in the loop consuming it, to a section
+        timings = self.timings
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                timings[section] += time.perf_counter() - start
+                return
+            timings[section] += time.perf_counter() - start
+            yield item
+
+    def order_moves(self, cur_node, candidates, tt_move):
+        # Search order of the candidate points, the transposition table move always first
+        engine = self.go.engine
+        tt_index = None if tt_move is None or tt_move == "PASS" else engine.index(tt_move[0], tt_move[1])
+        if self.ordering is not None:
+            ply = cur_node.move - self.root.move
+            return self.ordering.order(cur_node.chains, cur_node.type, candidates, ply, tt_index)
+        if tt_index is not None and candidates >> tt_index & 1:
+            return [tt_index] + list(iter_bits(candidates & ~(1 << tt_index)))
+        return list(iter_bits(candidates))
+
+    def stats(self):
+        return {'nodes': self.nodes, 'expanded': self.expanded, 'cutoffs': self.cutoffs, 'researches': self.researches}
+
+    def negamax(self, depth, cur_node, alpha=-1000, beta=1000):
+        # Alpha-beta in negamax form with principal variation search
+        # cur_node.reward is the value for the side to move within the (alpha, beta) window
         go = self.go
-        cur_node.reward = -1000
-        alpha = -1000
-        beta = 1000
-        if depth == 0:
-            cur_node.reward = go.reward(self.root.type, cur_node.board)
-            return cur_node
-
-        # find possible placements
-        possible_placements = []
-        for i in range(go.size):
-            for j in range(go.size):
-                if go.valid_place_check(i, j, type, board) and go.has_neighbour(i, j, board):
-                    possible_placements.append((i, j))
-        # if depth == 4:
-        #     print(possible_placements)
-        if not possible_placements:
-            cur_node.reward = go.reward(self.root.type, cur_node.board)
-            return cur_node
-        depth -= 1
-        new_type = 3 - type
-        for (i, j) in possible_placements:
-            # print("Placing", stone, "at", i, j, "...")
-            new_board = go.place(i, j, type, board)
-            # go.visualize_board(new_board)
-            # print("Calculating reward...")
-            new_child = Node(new_board, new_type, (i, j))
-            new_child = self.min_value(depth, new_child)
-            if new_child.reward > cur_node.reward:
-                cur_node.reward = new_child.reward
-                cur_node.next_step = new_child.step
-            if new_child.reward >= beta:
-                return cur_node
-            if new_child.reward > alpha:
-                alpha = new_child.reward
-        return cur_node
-
-    def min_value(self, depth, cur_node):
         type = cur_node.type
         board = cur_node.board
-        go = self.go
-        cur_node.reward = 1000
-        alpha = -1000
-        beta = 1000
-        if depth == 0:
-            cur_node.reward = go.reward(self.root.type, cur_node.board)
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 255 and time.time() > self.deadline:
+            raise SearchTimeout()
+        if cur_node.move >= go.max_move:
+            # The game is over (host.GO.game_end), so its result is known exactly
+            cur_node.reward = self.terminal_value(cur_node)
+            cur_node.next_step = None
             return cur_node
-
-        # find possible placements
-        possible_placements = []
-        for i in range(go.size):
-            for j in range(go.size):
-                if go.valid_place_check(i, j, type, board) and go.has_neighbour(i, j, board):
-                    possible_placements.append((i, j))
-        if not possible_placements:
-            cur_node.reward = go.reward(self.root.type, cur_node.board)
+        if depth == 0:
+            self.horizon += 1
+            if self.timings is None:
+                cur_node.reward = self.evaluate(cur_node)
+            else:
+                start = time.perf_counter()
+                cur_node.reward = self.evaluate(cur_node)
+                self.timings['evaluation'] += time.perf_counter() - start
             return cur_node
 
-        depth -= 1
-        new_type = 3 - type
-        for (i, j) in possible_placements:
-            # print("Placing", stone, "at", i, j, "...")
-            new_board = go.place(i, j, type, board)
-            # go.visualize_board(new_board)
-            # print("Calculating reward...")
-            new_child = Node(new_board, new_type, (i, j))
-            new_child = self.max_value(depth, new_child)
-            if new_child.reward < cur_node.reward:
-                cur_node.reward = new_child.reward
-                cur_node.next_step = new_child.step
-            if new_child.reward <= alpha:
-                return cur_node
-            if new_child.reward < beta:
-                beta = new_child.reward
+        key = None
+        alpha_orig = alpha
+        best_move = None
+        if self.table is not None:
+            key, symmetry = self.key(cur_node)
+            entry = self.table.probe(key)
+            if entry is not None:
+                # The previous iteration's best line is searched first
+                best_move = self.from_table(entry[3], symmetry)
+            if entry is not None and entry[0] >= depth:
+                value = entry[1]
+                if entry[2] == EXACT or (entry[2] == LOWER and value >= beta) or (
+                        entry[2] == UPPER and value <= alpha):
+                    # The stored subtree may have been cut off by depth unless it was resolved
+                    if entry[0] < RESOLVED:
+                        self.horizon += 1
+                    cur_node.reward = value
+                    cur_node.next_step = best_move
+                    return cur_node
+                if entry[2] == LOWER and value > alpha:
+                    alpha = value
+                elif entry[2] == UPPER and value < beta:
+                    beta = value
+
+        # children are generated lazily so a cut-off skips building the rest
+        self.expanded += 1
+        timings = self.timings
+        start = 0.0 if timings is None else time.perf_counter()
+        candidates = go.candidates(board)
+        if cur_node.move + 1 < go.max_move:
+            # On the last move no stone can be captured any more
+            candidates &= ~go.settled(cur_node.chains, type, go.max_move - cur_node.move)
+        order = self.order_moves(cur_node, candidates, best_move)
+        children = self.children(cur_node, order)
+        if timings is not None:
+            timings['movegen'] += time.perf_counter() - start
+            children = self.timed(children, 'movegen')
+        best = -1000
+        cur_node.next_step = None
+        searched = False  # the first child is searched with the full window
+        horizon = self.horizon
+        for step, new_child, captured in children:
+            # go.visualize_board(new_child.board)
+            if new_child is None:
+                value = self.terminal_value(cur_node)
+            elif not searched:
+                value = -self.negamax(depth - 1, new_child, -beta, -alpha).reward
+            else:
+                # Null window: only prove the move is no better than the principal variation
+                value = -self.negamax(depth - 1, new_child, -alpha - 1, -alpha).reward
+                if alpha < value < beta:
+                    self.researches += 1
+                    value = -self.negamax(depth - 1, new_child, -beta, -alpha).reward
+            searched = True
+            if value > best:
+                best = value
+                cur_node.next_step = step
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                self.cutoffs += 1
+                if self.ordering is not None and step != "PASS":
+                    self.ordering.cutoff(go.engine.index(step[0], step[1]), type, cur_node.move - self.root.move,
+                                         depth, captured)
+                break
+
+        cur_node.reward = best
+        if key is not None:
+            if best <= alpha_orig:
+                bound = UPPER
+            elif best >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            # A subtree with no leaf cut off by depth has the same value at any depth
+            self.table.store(key, depth if self.horizon > horizon else RESOLVED, best, bound,
+                             self.to_table(cur_node.next_step, symmetry))
         return cur_node
 
 
 class MyPlayer:
-    def __init__(self, depth):
+    def __init__(self, depth, time_limit=None, workers=1, book=None, cache=None, endgame=None, stats=None,
+                 profiler=None):
         self.type = 'random'
-        self.depth = depth
-
-    def get_input(self, go, piece_type, board):
-        possible_placements = []
-        for i in range(go.size):
-            for j in range(go.size):
-                if go.valid_place_check(i, j, piece_type, board):
-                    possible_placements.append((i, j))
+        self.depth = depth  # max depth, searched directly when there is no time limit
+        self.time_limit = time_limit  # seconds per move for iterative deepening
+        self.workers = workers or os.cpu_count() or 1  # processes for the root-parallel search
+        self.parallel = None
+        self.cache = cache  # PositionCache keeping results across processes, None for none
+        self.table = TranspositionTable(backing=cache)
+        self.table_type = None  # stored values are relative to the player we search for
+        self.ordering = None
+        self.completed_depth = 0
+        self.book = book  # OpeningBook answering the first moves without a search
+        self.endgame = endgame  # EndgameSolver playing the last moves exactly
+        self.stats = stats  # SearchStats recording every move, None for none
+        self.profiler = profiler  # SampledProfiler, None for none
+        self.timings = None  # section -> seconds of the current move when stats are recorded
+        self.minimax = None  # Minimax of the current move, None if it was not searched in this process
+        self.endgame_nodes = None  # nodes the EndgameSolver visited for the current move, None if it did not run
+
+    def search(self, go, root, time_limit=None):
+        if time_limit is None:
+            time_limit = self.time_limit
+        if self.ordering is None:
+            # Finding captures slows every node down more than putting them first saves nodes
+            self.ordering = MoveOrdering(go.engine, captures=False)
+        self.ordering.new_search()
+        if self.time_limit is None:
+            self.completed_depth = self.depth
+            self.minimax = Minimax(go, root, self.table, ordering=self.ordering, timings=self.timings)
+            return self.minimax.negamax(self.depth, root)
+
+        if self.workers > 1:
+            return self.search_parallel(go, root, time_limit)
+
+        # Iterative deepening: keep the result of the last iteration that finished in time
+        minimax = self.minimax = Minimax(go, root, self.table, deadline=time.time() + time_limit,
+                                         ordering=self.ordering, timings=self.timings)
+        best = None
+        self.completed_depth = 0
+        for depth in range(1, self.depth + 1):
+            minimax.horizon = 0
+            try:
+                minimax.negamax(depth, root)
+            except SearchTimeout:
+                break
+            best = (root.reward, root.next_step)
+            self.completed_depth = depth
+            if self.stats is not None:
+                self.stats.iteration(depth, minimax)
+            # Nothing was cut off by depth, so deeper iterations would search the same tree
+            if not minimax.horizon:
+                break
+        if best is not None:
+            root.reward, root.next_step = best
+        return root
+
+    def search_parallel(self, go, root, time_limit):
+        # Root moves are split across processes, see parallel.py
+        if self.parallel is None:
+            from parallel import RootParallel
+            self.parallel = RootParallel(self.workers, None if self.cache is None else self.cache.path)
+        # The counters of the workers stand in for self.minimax in the search stats
+        reward, next_step, self.completed_depth, self.minimax = self.parallel.search(
+            go, root.type, self.depth, time.time() + time_limit, self.timings,
+            None if self.stats is None else self.stats.iteration)
+        if next_step is not None:
+            root.reward, root.next_step = reward, next_step
+        return root
+
+    def get_input(self, go, piece_type, board=None):
+        if not isinstance(go, MyGO):
+            # Called by host.GO.play with the host's game, e.g. from the arena
+            go = from_host(go, piece_type)
+        self.minimax = None
+        self.endgame_nodes = None
+        self.timings = None
+        if self.stats is not None:
+            self.timings = self.stats.start(piece_type, go.move)
+        if self.profiler is not None:
+            self.profiler.start()
+        try:
+            step, source, value = self.select(go, piece_type)
+        finally:
+            if self.profiler is not None:
+                self.profiler.stop()
+        if self.stats is not None:
+            self.stats.finish(step, source, self.table, self.minimax, value,
+                              self.completed_depth if source == "search" else None, self.endgame_nodes)
+        return step
+
+    def select(self, go, piece_type):
+        # (move, where it came from: "forced", "book", "endgame" or "search", its value or None)
+        possible_placements = [move for move, _, _ in go.generate_moves(go.chains, piece_type, go.prev_position)]
         if not possible_placements:
-            return "Pass"
+            return "PASS", "forced", None
         # print(possible_placements)
         if len(possible_placements) == 25:
-            return (2, 2)
-        root = Node(go.board, piece_type, None)
+            return (2, 2), "book", None
+        start = time.time()
+        if self.endgame is not None and go.max_move - go.move <= self.endgame.moves:
+            # Half the time to prove a win or a tie; against a proven loss the heuristic
+            # search still picks the move most likely to trouble an imperfect opponent
+            deadline = None if self.time_limit is None else start + self.time_limit / 2
+            solved = self.endgame.solve(go.position, go.prev_position, piece_type, go.move, deadline)
+            self.endgame_nodes = self.endgame.nodes
+            if solved is not None:
+                self.endgame.save()
+                value, step = solved
+                if value >= 0:
+                    return step if step == "PASS" else go.engine.point(step), "endgame", value
+        # Book entries ignore the KO point, so only use them when no point is forbidden
+        if self.book is not None and go.ko_point(go.chains, piece_type, go.prev_position) is None:
+            index = self.book.lookup(go.position, piece_type)
+            if index is not None and go.engine.point(index) in possible_placements:
+                return go.engine.point(index), "book", None
+        root = Node(go.chains, piece_type, None, ko=go.prev_position,
+                    board_hash=go.zobrist.board_hash(go.position), move=go.move)
         # go.visualize_board(root.board)
-        minimax = Minimax(go, root)
-        root = minimax.max_value(self.depth, root)
-        print(root.next_step)
-        go.visualize_board(root.board)
-        return root.next_step
+        if piece_type != self.table_type:
+            self.table.clear()
+            self.table_type = piece_type
+            if self.cache is not None:
+                self.cache.set_perspective(piece_type)
+        self.table.new_search()
+        if self.stats is not None:
+            self.stats.search(self.table)
+        root = self.search(go, root, None if self.time_limit is None else self.time_limit - (time.time() - start))
+        if root.next_step is None:
+            root.next_step = possible_placements[0]
+        return root.next_step, "search", root.reward
+
+
+TIME_LIMIT = 5.0  # seconds of search per move
+DAEMON_GRACE = 1.0  # seconds a daemon may take beyond --time before the move is searched here
+MOVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "move{}.txt")  # one per piece type
+
+
+def parseInput(n, lines):
+    piece_type = int(lines[0])
+
+    previous_board = [[int(x) for x in line.rstrip('\n')] for line in lines[1:n + 1]]
+    board = [[int(x) for x in line.rstrip('\n')] for line in lines[n + 1: 2 * n + 1]]
+
+    return piece_type, previous_board, board
 
 
 def readInput(n, path="input.txt"):
     with open(path, 'r') as f:
         lines = f.readlines()
 
-        piece_type = int(lines[0])
+        return parseInput(n, lines)
 
-        previous_board = [[int(x) for x in line.rstrip('\n')] for line in lines[1:n + 1]]
-        board = [[int(x) for x in line.rstrip('\n')] for line in lines[n + 1: 2 * n + 1]]
 
-        return piece_type, previous_board, board
-
-
-def writeOutput(result, path="output.txt"):
+def formatOutput(result):
     res = ""
     if result == "PASS":
         res = "PASS"
     else:
         res += str(result[0]) + ',' + str(result[1])
+    return res
+
+
+def writeOutput(result, path="output.txt"):
+    res = formatOutput(result)
 
     with open(path, 'w') as f:
         f.write(res)
 
 
-if __name__ == "__main__":
-    N = 5
-    piece_type, previous_board, board = readInput(N)
-    go = MyGO(N)
+def count_moves(n, piece_type, previous_board, board, path=MOVE_PATH):
+    '''
+    Number of moves played so far (host.GO.n_move), which input.txt does not hold.
+
+    After each move, record_move() saves the move number and the board it left. If the
+    opponent's move started from that board, two moves were played since. Otherwise the
+    count is estimated from the stones on the board.
+
+    :param n: size of the board n*n
+    :param piece_type: side to move.
+    :param previous_board: board before the opponent's last move.
+    :param board: current board.
+    :param path: file written by record_move(), formatted with the piece type.
+    :return: int move number.
+    '''
+    stones = sum(1 for row in board for x in row if x)
+    if not any(x for row in previous_board for x in row) and stones <= 1:
+        # First move of either player
+        return stones
+    try:
+        with open(path.format(piece_type), 'r') as f:
+            lines = f.read().split()
+        if [[int(x) for x in line] for line in lines[1:n + 1]] == previous_board:
+            return int(lines[0]) + 2
+    except (OSError, ValueError, IndexError):
+        pass
+    # Every stone took a move, and 'X' moves on even numbers
+    return stones + (stones % 2 != piece_type - 1)
+
+
+def record_move(n, piece_type, move, board, path=MOVE_PATH):
+    '''
+    Save the move number and the board after our move, for count_moves() on the next one.
+
+    :param n: size of the board n*n
+    :param piece_type: side that moved.
+    :param move: number of moves played before ours.
+    :param board: board after our move.
+    :param path: file read by count_moves(), formatted with the piece type.
+    :return: None.
+    '''
+    with open(path.format(piece_type), 'w') as f:
+        f.write("{}\n".format(move))
+        f.write("".join("".join(str(x) for x in row) + "\n" for row in board))
+
+
+def play(player, n, piece_type, previous_board, board):
+    go = MyGO(n)
     go.set_board(piece_type, previous_board, board)
-    player = MyPlayer(depth=4)
+    go.move = count_moves(n, piece_type, previous_board, board)
     action = player.get_input(go, piece_type, board)
-    writeOutput(action)
+    after = go.position
+    if action != "PASS":
+        after = go.engine.place(go.position, go.engine.index(action[0], action[1]), piece_type)[0]
+    record_move(n, piece_type, go.move, go.engine.to_board(after))
+    return action
+
+
+def build_player(n, args):
+    # The player of the command line, with its book, cache and tablebase loaded
+    go = MyGO(n)
+    # cProfile only sees this process, so a profiled player does not hand the search to workers
+    return MyPlayer(depth=n * n - 1, time_limit=args.time, workers=1 if args.profile else args.workers,
+                    book=OpeningBook.load(go.engine), cache=PositionCache(args.cache) if args.cache else None,
+                    endgame=EndgameSolver(go, path=TABLEBASE_PATH),
+                    stats=SearchStats(args.stats) if args.stats else None,
+                    profiler=SampledProfiler(args.profile, args.profile_every) if args.profile else None)
+
+
+def answer(player, n, text):
+    # Daemon handler: input.txt text in, output.txt text out, with the player kept warm
+    piece_type, previous_board, board = parseInput(n, text.splitlines())
+    if len(board) != n or any(len(row) != n for row in board):
+        raise ValueError("incomplete input")
+    return formatOutput(play(player, n, piece_type, previous_board, board))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--daemon", "-d", action="store_true", help="serve moves over a local socket")
+    parser.add_argument("--watch", "-w", action="store_true", help="watch input.txt and write output.txt")
+    parser.add_argument("--piece", type=int, help="with --watch, only play as 1('X') or 2('O')", default=None)
+    parser.add_argument("--port", "-p", type=int, help="port of the daemon", default=daemon.DEFAULT_PORT)
+    parser.add_argument("--time", "-t", type=float, help="seconds of search per move", default=TIME_LIMIT)
+    parser.add_argument("--workers", "-j", type=int, help="processes for the root moves, every core by default",
+                        default=None)
+    parser.add_argument("--cache", "-c", type=str, help="position cache file, empty to disable", default=CACHE_PATH)
+    parser.add_argument("--stats", "-s", type=str, help="append a JSON line of search stats per move to a file, "
+                                                        "- for stderr", default=None)
+    parser.add_argument("--profile", type=str, help="pstats file profiling one search out of --profile-every, "
+                                                    "searches in this process only, as with --workers 1",
+                        default=None)
+    parser.add_argument("--profile-every", type=int, help="searches between two profiled ones", default=10)
+    args = parser.parse_args()
+
+    N = 5
+    if args.daemon:
+        player = build_player(N, args)
+        daemon.serve(lambda text: answer(player, N, text), port=args.port)
+    elif args.watch:
+        player = build_player(N, args)
+        daemon.watch(lambda text: answer(player, N, text), piece_type=args.piece)
+    else:
+        # Use a running daemon if there is one, otherwise search in this process
+        with open("input.txt", 'r') as f:
+            text = f.read()
+        res = daemon.request_move(text, port=args.port, timeout=args.time + DAEMON_GRACE)
+        if res is None:
+            res = answer(build_player(N, args), N, text)
+        with open("output.txt", 'w') as f:
+            f.write(res)
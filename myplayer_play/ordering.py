@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: ordering
+# Description: Move ordering heuristics for the Minimax search
+# TodoList:
+
+from bitboard import iter_bits, popcount
+
+TT_SCORE = 1 << 30  # best move stored in the transposition table (previous principal variation)
+CAPTURE_SCORE = 1 << 26  # plus the number of captured stones
+ESCAPE_SCORE = 1 << 26  # extends a group of ours that is in atari
+KILLER_SCORE = 1 << 24  # caused a cut-off at the same ply elsewhere in the tree
+
+
+class MoveOrdering:
+    def __init__(self, engine, captures=True, killers=True, history=True, n_killers=2):
+        '''
+        Orders candidate moves so the likely best ones are searched first.
+
+        Moves are ranked by transposition table move, then captures and atari escapes,
+        then killer moves of the same ply, then the history table. Each heuristic can be
+        switched off.
+
+        :param engine: Bitboard instance.
+        :param captures: boolean, rank captures and atari escapes first.
+        :param killers: boolean, use killer moves per ply.
+        :param history: boolean, use the history table.
+        :param n_killers: number of killer moves kept per ply.
+        '''
+        self.engine = engine
+        self.captures = captures
+        self.killers = killers
+        self.history = history
+        self.n_killers = n_killers
+        self.killer_moves = {}  # ply -> list of point indexes
+        self.history_table = [[0] * engine.cells for _ in range(3)]  # piece_type -> index -> score
+
+    def new_search(self):
+        '''
+        Forget the killer moves and age the history table before a new search.
+
+        :return: None.
+        '''
+        self.killer_moves = {}
+        for table in self.history_table:
+            for index in range(len(table)):
+                table[index] >>= 1
+
+    def order(self, chains, piece_type, candidates, ply, tt_move=None):
+        '''
+        Sort the candidate points of a node.
+
+        :param chains: Chains of the node.
+        :param piece_type: side to move.
+        :param candidates: bitboard of the points to order.
+        :param ply: distance from the root.
+        :param tt_move: point index of the transposition table move, None if there is none.
+        :return: a list of point indexes, best first.
+        '''
+        own = self.engine.stones(chains.position, piece_type)
+        neighbor_points = self.engine.neighbor_points
+        killers = self.killer_moves.get(ply, ()) if self.killers else ()
+        history = self.history_table[piece_type]
+        scored = []
+        for index in iter_bits(candidates):
+            score = history[index] if self.history else 0
+            if index == tt_move:
+                score += TT_SCORE
+            if index in killers:
+                score += KILLER_SCORE
+            if self.captures:
+                captured = chains.captures(index, piece_type)
+                if captured:
+                    score += CAPTURE_SCORE + popcount(captured)
+                else:
+                    bit = 1 << index
+                    for q in neighbor_points[index]:
+                        if own >> q & 1 and chains.liberties(q) == bit:
+                            score += ESCAPE_SCORE
+                            break
+            scored.append((-score, index))
+        scored.sort()
+        return [index for _, index in scored]
+
+    def cutoff(self, index, piece_type, ply, depth, captured=0):
+        '''
+        Record a move that caused a beta cut-off.
+
+        :param index: point index of the move.
+        :param piece_type: side that played it.
+        :param ply: distance from the root.
+        :param depth: remaining depth of the node.
+        :param captured: stones the move captured; captures are already ordered first.
+        :return: None.
+        '''
+        if self.history:
+            self.history_table[piece_type][index] += depth * depth
+        if self.killers and not captured:
+            killers = self.killer_moves.setdefault(ply, [])
+            if index not in killers:
+                killers.insert(0, index)
+                del killers[self.n_killers:]
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: parallel
+# Description: Root-parallel iterative deepening for MyPlayer on a process pool
+# TodoList:
+
+import multiprocessing
+import os
+
+from my_player3 import MyGO, Minimax, Node, SearchTimeout
+from cache import PositionCache
+from instrumentation import SECTIONS
+from ordering import MoveOrdering
+from transposition import TranspositionTable
+
+# State of a worker process, kept between tasks so its table stays warm
+worker_table = None
+worker_type = None
+worker_search = None  # search the worker last worked for
+best_value = None
+
+
+def init_worker(shared, cache_path=None):
+    global worker_table, best_value
+    # Every worker maps the same cache file, so they also share results with each other
+    worker_table = TranspositionTable(backing=PositionCache(cache_path) if cache_path else None)
+    best_value = shared
+
+
+def search_root_move(task):
+    '''
+    Search one root move in a worker, raising the shared best value when it improves on it.
+
+    :param task: (search id, piece_type, previous board, board, move number, root move or "PASS", depth, deadline,
+                 boolean time the sections of the search).
+    :return: (root move, value or None if the deadline passed, boolean exact value, leaves cut off by depth,
+              counters of the search for SearchCounters.add).
+    '''
+    global worker_type, worker_search
+    search, piece_type, previous_board, board, move, step, depth, deadline, timed = task
+    if search != worker_search:
+        # Like MyPlayer does before each move, so entries of earlier searches can be replaced, but
+        # the generation of the shared cache is MyPlayer's to start
+        worker_table.new_search(owner=False)
+        worker_search = search
+    if piece_type != worker_type:
+        worker_table.clear()
+        worker_type = piece_type
+        if worker_table.backing is not None:
+            worker_table.backing.set_perspective(piece_type)
+    tables = table_counters()
+    go = MyGO(len(board))
+    go.set_board(piece_type, previous_board, board)
+    root = Node(go.chains, piece_type, None, ko=go.prev_position,
+                board_hash=go.zobrist.board_hash(go.position), move=move)
+    # Moves after the first only need to beat the best value found by any worker
+    alpha = best_value.value
+    minimax = Minimax(go, root, worker_table, deadline=deadline, ordering=MoveOrdering(go.engine, captures=False),
+                      timings=dict.fromkeys(SECTIONS, 0.0) if timed else None)
+    order = [] if step == "PASS" else [go.engine.index(step[0], step[1])]
+    _, child, _ = next(minimax.children(root, order))
+    try:
+        if child is None:
+            # Passing ends the game
+            value = minimax.terminal_value(root)
+        else:
+            value = -minimax.negamax(depth - 1, child, -1000, -alpha).reward
+    except SearchTimeout:
+        value = None
+    counters = (minimax.stats(), minimax.timings,
+                {name: (probes - tables[name][0], hits - tables[name][1])
+                 for name, (probes, hits) in table_counters().items()})
+    if value is None:
+        return step, None, False, 0, counters
+    with best_value.get_lock():
+        if value > best_value.value:
+            best_value.value = value
+    return step, value, value > alpha, minimax.horizon, counters
+
+
+def table_counters():
+    counters = {'table': (worker_table.probes, worker_table.hits)}
+    if worker_table.backing is not None:
+        counters['cache'] = (worker_table.backing.probes, worker_table.backing.hits)
+    return counters
+
+
+class SearchCounters:
+    def __init__(self, timings=None):
+        '''
+        Counters of Minimax added up over the tasks of a RootParallel search, under the same
+        names, so SearchStats records a parallel search like one in a single process.
+
+        :param timings: dict of section -> seconds the timings of the workers are added to,
+                        None to not time them. Seconds are summed over the workers.
+        '''
+        self.nodes = 0
+        self.expanded = 0
+        self.cutoffs = 0
+        self.researches = 0
+        self.timings = timings
+        self.tables = {}  # 'table' or 'cache' -> [probes, hits] of the worker tables
+
+    def add(self, counters):
+        '''
+        :param counters: counters returned by search_root_move().
+        :return: None.
+        '''
+        stats, timings, tables = counters
+        self.nodes += stats['nodes']
+        self.expanded += stats['expanded']
+        self.cutoffs += stats['cutoffs']
+        self.researches += stats['researches']
+        if self.timings is not None and timings is not None:
+            for section, spent in timings.items():
+                self.timings[section] += spent
+        for name, (probes, hits) in tables.items():
+            total = self.tables.setdefault(name, [0, 0])
+            total[0] += probes
+            total[1] += hits
+
+
+class RootParallel:
+    def __init__(self, workers=None, cache_path=None):
+        '''
+        Splits the root moves of every iteration across a pool of processes.
+
+        :param workers: number of processes, None uses every core.
+        :param cache_path: PositionCache file opened by every worker, None for none.
+        '''
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_path = cache_path
+        self.pool = None
+        self.shared = None
+        self.searches = 0
+
+    def start(self):
+        if self.pool is None:
+            self.shared = multiprocessing.Value('i', -1000)
+            self.pool = multiprocessing.Pool(self.workers, initializer=init_worker,
+                                             initargs=(self.shared, self.cache_path))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def search(self, go, piece_type, max_depth, deadline, timings=None, iteration=None):
+        '''
+        Iterative deepening with the root moves searched in parallel.
+
+        Each iteration tries the moves in the order of the previous iteration's values, so
+        the best move so far sets the shared bound that the other moves are searched against.
+
+        :param go: MyGO instance of the position.
+        :param piece_type: side to move.
+        :param max_depth: deepest iteration.
+        :param deadline: time.time() at which the search is abandoned.
+        :param timings: dict of section -> seconds the workers add their timings to, None to not time them.
+        :param iteration: function (depth, SearchCounters) called after every completed iteration, e.g.
+                          SearchStats.iteration, None for none.
+        :return: (value, best move, depth of the last completed iteration, SearchCounters of every worker),
+                 value and move are None if no iteration completed.
+        '''
+        self.start()
+        self.searches += 1
+        counters = SearchCounters(timings)
+        order = [point for point, _, _ in go.generate_moves(go.chains, piece_type, go.prev_position,
+                                                           go.candidates(go.position))] + ["PASS"]
+        best = (None, None)
+        completed = 0
+        for depth in range(1, max_depth + 1):
+            self.shared.value = -1000
+            tasks = [(self.searches, piece_type, go.prev_board, go.board, go.move, step, depth, deadline,
+                      timings is not None) for step in order]
+            results = list(self.pool.imap(search_root_move, tasks))
+            for result in results:
+                counters.add(result[4])
+            if any(value is None for _, value, _, _, _ in results):
+                break
+            # Exact values first among equals; the first of them in move order wins
+            ranked = sorted(results, key=lambda result: (-result[1], not result[2]))
+            best = (ranked[0][1], ranked[0][0])
+            order = [step for step, _, _, _, _ in ranked]
+            completed = depth
+            if iteration is not None:
+                iteration(depth, counters)
+            if not sum(horizon for _, _, _, horizon, _ in results):
+                break
+        return best[0], best[1], completed, counters
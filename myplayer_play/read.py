@@ -17,14 +17,18 @@ def readInput(n, path="input.txt"):
         return piece_type, previous_board, board
 
 
-def readOutput(path="output.txt"):
-    with open(path, 'r') as f:
-        position = f.readline().strip().split(',')
+def parseOutput(line):
+    position = line.strip().split(',')
 
-        if position[0] == "PASS":
-            return "PASS", -1, -1
+    if position[0] == "PASS":
+        return "PASS", -1, -1
 
-        x = int(position[0])
-        y = int(position[1])
-        # print(x, y)
+    x = int(position[0])
+    y = int(position[1])
+    # print(x, y)
     return "MOVE", x, y
+
+
+def readOutput(path="output.txt"):
+    with open(path, 'r') as f:
+        return parseOutput(f.readline())
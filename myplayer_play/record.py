@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: record
+# Description: Compact binary game records, written game by game and replayed lazily into GO states
+# TodoList:
+
+import argparse
+import os
+import struct
+from collections import Counter
+
+from host import GO
+
+MAGIC = b'GORF'
+VERSION = 1  # bump when the layout changes
+HEADER = struct.Struct('<4sBB2x')  # magic, version, size of the board
+# moves, result, flags, length of the black name, of the white name, seed
+GAME = struct.Struct('<HBBBBq')
+TIMING = struct.Struct('<H')
+PASS_MOVE = 0xfe
+INVALID_MOVE = 0xfd  # a move off the board or missing, which lost the game
+NO_RESULT = 0xff
+MAX_TIME = 0xffff  # milliseconds, longer moves are stored as MAX_TIME
+HAS_SEED = 1
+HAS_TIMINGS = 2
+
+
+class GameRecord:
+    def __init__(self, black, white, seed=None, n=5, timed=True):
+        '''
+        One game: the players, the seed, one byte per move, the time of every move and the result.
+
+        A move is the index i * n + j of its point, PASS_MOVE or INVALID_MOVE. move() and end()
+        make a GameRecord a recorder for GO.play and host.referee.
+
+        :param black: name of the Black player.
+        :param white: name of the White player.
+        :param seed: int seed the game was played with, None if unknown.
+        :param n: size of the board n*n
+        :param timed: boolean, keep the time of every move.
+        '''
+        self.black = black
+        self.white = white
+        self.seed = seed
+        self.n = n
+        self.moves = bytearray()
+        self.timings = [] if timed else None  # milliseconds
+        self.length = 0
+        self.result = None
+
+    def move(self, action, seconds=None):
+        '''
+        Add a move.
+
+        :param action: (i, j), "PASS", or None when the player gave no valid move.
+        :param seconds: time the move took, None if unknown, which drops the timings of the game.
+        :return: None.
+        '''
+        n = self.n
+        if action == "PASS":
+            self.moves.append(PASS_MOVE)
+        elif action is not None and 0 <= action[0] < n and 0 <= action[1] < n:
+            self.moves.append(action[0] * n + action[1])
+        else:
+            self.moves.append(INVALID_MOVE)
+        self.length += 1
+        if self.timings is not None:
+            if seconds is None:
+                self.timings = None
+            else:
+                self.timings.append(min(int(round(seconds * 1000)), MAX_TIME))
+
+    def end(self, result):
+        '''
+        :param result: winner of the game (0 if it's a tie).
+        :return: None.
+        '''
+        self.result = result
+
+    def actions(self):
+        '''
+        :return: generator of the moves: (i, j), "PASS" or None for INVALID_MOVE.
+        '''
+        for index in self.moves:
+            if index == PASS_MOVE:
+                yield "PASS"
+            elif index == INVALID_MOVE:
+                yield None
+            else:
+                yield divmod(index, self.n)
+
+    def pack(self):
+        '''
+        :return: bytes of the game in the file.
+        '''
+        black = self.black.encode('utf-8')[:255]
+        white = self.white.encode('utf-8')[:255]
+        flags = (HAS_SEED if self.seed is not None else 0) | (HAS_TIMINGS if self.timings is not None else 0)
+        result = NO_RESULT if self.result is None else self.result
+        data = GAME.pack(len(self.moves), result, flags, len(black), len(white), self.seed or 0)
+        data += black + white + bytes(self.moves)
+        if self.timings is not None:
+            data += struct.pack('<{}H'.format(len(self.timings)), *self.timings)
+        return data
+
+
+class RecordWriter:
+    def __init__(self, path, n=5):
+        '''
+        Appends games to a record file, each written and flushed as soon as it ends, so a
+        crash loses at most the game being played.
+
+        It is a recorder for GO.play and host.referee itself: begin() a game, and move() and
+        end() add to it. Games recorded elsewhere, e.g. in another process, go in with write().
+
+        :param path: record file, created with its header if it does not exist.
+        :param n: size of the board n*n
+        '''
+        self.path = path
+        self.n = n
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, n))
+        else:
+            with open(path, 'rb') as f:
+                if read_header(f) != n:
+                    raise ValueError("{} records games on another board size".format(path))
+        self.game = None
+        self.games = 0
+
+    def begin(self, black, white, seed=None, timed=True):
+        '''
+        Start recording a game, see GameRecord.
+
+        :return: the GameRecord.
+        '''
+        self.game = GameRecord(black, white, seed, self.n, timed)
+        return self.game
+
+    def move(self, action, seconds=None):
+        self.game.move(action, seconds)
+
+    def end(self, result):
+        '''
+        End the game begun and write it.
+
+        :param result: winner of the game (0 if it's a tie).
+        :return: None.
+        '''
+        self.game.end(result)
+        self.write(self.game)
+        self.game = None
+
+    def write(self, record):
+        '''
+        :param record: GameRecord.
+        :return: None.
+        '''
+        if record.n != self.n:
+            raise ValueError("Game on a {0}x{0} board in a {1}x{1} record file".format(record.n, self.n))
+        self.file.write(record.pack())
+        self.file.flush()
+        self.games += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(f):
+    '''
+    :param f: record file opened in binary mode, at its start.
+    :return: size of the board.
+    '''
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("Not a game record file")
+    magic, version, n = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("Not a game record file")
+    if version != VERSION:
+        raise ValueError("Game record version {} is not {}".format(version, VERSION))
+    return n
+
+
+def read_records(path, moves=True):
+    '''
+    Read the games of a record file one at a time.
+
+    A game cut short at the end of the file, by a writer that did not finish it, is skipped.
+
+    :param path: record file.
+    :param moves: boolean, read the moves and the timings. Without them a game is only its
+                  header, and the reader seeks past the rest, to scan large files quickly.
+    :return: generator of GameRecord, with moves and timings None when not read.
+    '''
+    with open(path, 'rb') as f:
+        n = read_header(f)
+        end = os.fstat(f.fileno()).st_size
+        while True:
+            data = f.read(GAME.size)
+            if len(data) < GAME.size:
+                return
+            length, result, flags, black_length, white_length, seed = GAME.unpack(data)
+            names = f.read(black_length + white_length)
+            size = length * (1 + TIMING.size) if flags & HAS_TIMINGS else length
+            if len(names) < black_length + white_length:
+                return
+            record = GameRecord(names[:black_length].decode('utf-8', 'replace'),
+                                names[black_length:].decode('utf-8', 'replace'),
+                                seed if flags & HAS_SEED else None, n, bool(flags & HAS_TIMINGS))
+            record.length = length
+            record.result = None if result == NO_RESULT else result
+            if moves:
+                payload = f.read(size)
+                if len(payload) < size:
+                    return
+                record.moves = bytearray(payload[:length])
+                if record.timings is not None:
+                    record.timings = list(struct.unpack_from('<{}H'.format(length), payload, length))
+            else:
+                if f.tell() + size > end:
+                    return
+                f.seek(size, 1)
+                record.moves = None
+                record.timings = None
+            yield record
+
+
+def replay(record):
+    '''
+    Play a game again, one move at a time, with the rules of host.referee.
+
+    The same GO instance is updated and yielded after every move, so copy it with
+    copy_board() to keep a state. A last move that is invalid is not played.
+
+    :param record: GameRecord with its moves.
+    :return: generator of (piece type that moved, move, GO instance).
+    '''
+    go = GO(record.n)
+    go.init_board(record.n)
+    piece_type = 1
+    for action in record.actions():
+        if action is None:
+            return
+        if action == "PASS":
+            go.previous_board = go.board
+            go.died_pieces = []
+        else:
+            if not go.place_chess(action[0], action[1], piece_type):
+                return
+            go.died_pieces = go.remove_died_pieces(3 - piece_type)
+        go.n_move += 1
+        yield piece_type, action, go
+        piece_type = 3 - piece_type
+
+
+def formatted(action):
+    if action is None:
+        return "invalid"
+    return action if action == "PASS" else "{},{}".format(action[0], action[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=str, help="record file")
+    parser.add_argument("--show", type=int, help="replay the game with this index, from 0", default=None)
+    args = parser.parse_args()
+
+    if args.show is None:
+        games = 0
+        moves = 0
+        results = Counter()
+        for record in read_records(args.path, moves=False):
+            games += 1
+            moves += record.length
+            results[record.result] += 1
+        print("Games: {} | Moves per game: {:.1f}".format(games, moves / games if games else 0.0))
+        print("Black wins: {} | White wins: {} | Ties: {}".format(results[1], results[2], results[0]))
+    else:
+        for index, record in enumerate(read_records(args.path)):
+            if index == args.show:
+                print("Black: {} | White: {} | Seed: {} | Winner: {}".format(
+                    record.black, record.white, record.seed, record.result))
+                timings = record.timings or [None] * record.length
+                states = replay(record)
+                for action, ms in zip(record.actions(), timings):
+                    print("{} {}".format(formatted(action), "" if ms is None else "({} ms)".format(ms)))
+                    state = next(states, None)
+                    if state is not None:
+                        state[2].visualize_board()
+                break
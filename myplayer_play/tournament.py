@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: tournament
+# Description: Round-robin tournament between agent configurations on a process pool
+# TodoList:
+
+import argparse
+import contextlib
+import itertools
+import math
+import multiprocessing
+import random
+
+from arena import parse_player, play_game
+from record import RecordWriter
+
+
+def game_seed(seed, index):
+    '''
+    Seed of one game, independent of which worker plays it or in which order.
+
+    :param seed: seed of the tournament.
+    :param index: index of the game in the schedule.
+    :return: int seed.
+    '''
+    return (seed * 1000003 + index) & 0xffffffff
+
+
+def schedule(specs, games, seed=0):
+    '''
+    List the games of a round-robin, each pair playing the same number of games with each colour.
+
+    :param specs: list of player configurations, see arena.parse_player().
+    :param games: number of games per pair.
+    :param seed: seed of the tournament.
+    :return: a list of (index, black spec, white spec, game seed).
+    '''
+    tasks = []
+    for first, second in itertools.combinations(specs, 2):
+        for k in range(games):
+            black, white = (second, first) if k % 2 == 0 else (first, second)
+            index = len(tasks)
+            tasks.append((index, black, white, game_seed(seed, index)))
+    return tasks
+
+
+def run_game(task):
+    '''
+    Play one scheduled game. Players are built inside the worker so no state is shared between games.
+
+    :param task: (index, black spec, white spec, game seed).
+    :return: (index, black spec, white spec, winner, moves, move latencies of black, of white, GameRecord).
+    '''
+    index, black, white, seed = task
+    random.seed(seed)
+    game = play_game(parse_player(black), parse_player(white), names=(black, white), seed=seed)
+    return (index, black, white, game['winner'], game['moves'], game['latencies'][1], game['latencies'][2],
+            game['record'])
+
+
+def wilson_interval(score, n, z=1.96):
+    '''
+    Confidence interval of a score rate, counting a tie as half a win.
+
+    :param score: wins plus half the ties.
+    :param n: number of games.
+    :param z: normal quantile, 1.96 for 95%.
+    :return: (low, high) bounds of the rate.
+    '''
+    if n == 0:
+        return 0.0, 1.0
+    p = score / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def run_tournament(specs, games=20, workers=None, seed=0, recorder=None):
+    '''
+    Play a round-robin tournament on a process pool.
+
+    :param specs: list of player configurations, see arena.parse_player().
+    :param games: number of games per pair.
+    :param workers: number of processes, None uses every core, 1 plays in this process.
+    :param seed: seed of the tournament.
+    :param recorder: RecordWriter every game is written to as soon as it ends, None records nothing.
+    :return: a list of game results sorted by index, see run_game().
+    '''
+    tasks = schedule(specs, games, seed)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    results = []
+    with contextlib.ExitStack() as stack:
+        if workers <= 1:
+            played = map(run_game, tasks)
+        else:
+            played = stack.enter_context(multiprocessing.Pool(workers)).imap_unordered(run_game, tasks)
+        for result in played:
+            if recorder is not None:
+                recorder.write(result[-1])
+            results.append(result)
+    return sorted(results, key=lambda result: result[0])
+
+
+def standings(specs, results):
+    '''
+    Aggregate game results per player and per pair.
+
+    :param specs: list of player configurations.
+    :param results: list returned by run_tournament().
+    :return: a list of lines.
+    '''
+    totals = {spec: [0, 0, 0] for spec in specs}  # [win, lose, tie]
+    pairs = {}
+    latencies = {spec: [] for spec in specs}
+    for _, black, white, winner, _, black_latencies, white_latencies, _ in results:
+        latencies[black].extend(black_latencies)
+        latencies[white].extend(white_latencies)
+        for spec, other, piece_type in ((black, white, 1), (white, black, 2)):
+            record = pairs.setdefault((spec, other), [0, 0, 0])
+            outcome = 2 if winner == 0 else (0 if winner == piece_type else 1)
+            record[outcome] += 1
+            totals[spec][outcome] += 1
+
+    lines = ["=====Standings====="]
+    for spec in sorted(specs, key=lambda s: -(totals[s][0] + totals[s][2] / 2)):
+        win, lose, tie = totals[spec]
+        n = win + lose + tie
+        low, high = wilson_interval(win + tie / 2, n)
+        moves = latencies[spec]
+        mean = sum(moves) / len(moves) if moves else 0.0
+        lines.append("{} | Win: {} | Lose: {} | Tie: {} | Score: {:.3f} [{:.3f}, {:.3f}] | Move: {:.4f}s".format(
+            spec, win, lose, tie, (win + tie / 2) / n if n else 0.0, low, high, mean))
+    lines.append("=====Pairs=====")
+    for (spec, other), (win, lose, tie) in sorted(pairs.items()):
+        n = win + lose + tie
+        low, high = wilson_interval(win + tie / 2, n)
+        lines.append("{} vs {} | Win: {} | Lose: {} | Tie: {} | Score: {:.3f} [{:.3f}, {:.3f}]".format(
+            spec, other, win, lose, tie, (win + tie / 2) / n, low, high))
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("players", nargs="+", help='player configurations, e.g. random "my:time=0.5" "my:depth=4"')
+    parser.add_argument("--games", "-g", type=int, help="number of games per pair", default=20)
+    parser.add_argument("--workers", "-j", type=int, help="number of processes, every core by default", default=None)
+    parser.add_argument("--seed", "-s", type=int, help="tournament seed", default=0)
+    parser.add_argument("--record", type=str, help="append the games to this game record file", default=None)
+    args = parser.parse_args()
+
+    if len(set(args.players)) != len(args.players) or len(args.players) < 2:
+        parser.error("a tournament needs at least two different players")
+    recorder = RecordWriter(args.record) if args.record else None
+    results = run_tournament(args.players, args.games, args.workers, args.seed, recorder)
+    if recorder is not None:
+        recorder.close()
+    for line in standings(args.players, results):
+        print(line)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+# ProjectName: HW2
+# FileName: transposition
+# Description: Zobrist hashing and a bounded transposition table for the Minimax search
+# TodoList:
+
+import random
+
+from bitboard import Bitboard, iter_bits, popcount
+
+EXACT = 0  # value is the minimax value of the position
+LOWER = 1  # value is a lower bound (the search failed high)
+UPPER = 2  # value is an upper bound (the search failed low)
+RESOLVED = 1000  # depth stored for a subtree searched to the end of every line
+
+
+class Zobrist:
+    def __init__(self, n, max_move, seed=561, symmetric_stones=8):
+        '''
+        Random 64-bit keys for every (point, piece type), side to move, KO point and move number.
+
+        Positions with few stones are keyed by the smallest hash of their 8 rotations and
+        reflections, so symmetric positions share one key. Later positions are rarely symmetric
+        to each other and keep the incremental hash of the board as it is.
+
+        :param n: size of the board n*n
+        :param max_move: the max movement of a Go game
+        :param seed: seed for the keys, so hashes are stable across processes
+        :param symmetric_stones: positions with at most this many stones get the symmetric key.
+        '''
+        rng = random.Random(seed)
+        cells = n * n
+        self.stone_keys = [[0] * cells, [rng.getrandbits(64) for _ in range(cells)],
+                           [rng.getrandbits(64) for _ in range(cells)]]
+        self.side_keys = [0, rng.getrandbits(64), rng.getrandbits(64)]
+        # The last slot stands for "no KO point"
+        self.ko_keys = [rng.getrandbits(64) for _ in range(cells)] + [0]
+        self.move_keys = [rng.getrandbits(64) for _ in range(max_move + 2)]
+        self.passed_key = rng.getrandbits(64)
+        self.symmetric_stones = symmetric_stones
+
+        # image_keys[piece_type][index][k] is the key of the point where symmetry k sends index
+        symmetries = Bitboard(n).symmetries
+        self.image_keys = [[tuple(keys[permutation[index]] for permutation in symmetries) for index in range(cells)]
+                           for keys in self.stone_keys]
+        self.image_ko_keys = [tuple(self.ko_keys[permutation[index]] for permutation in symmetries)
+                              for index in range(cells)] + [(0,) * len(symmetries)]
+
+    def board_hash(self, position):
+        '''
+        Hash the stones of a position from scratch.
+
+        :param position: (black, white) bitboards.
+        :return: 64-bit hash of the stones.
+        '''
+        h = 0
+        for piece_type in (1, 2):
+            keys = self.stone_keys[piece_type]
+            for index in iter_bits(position[piece_type - 1]):
+                h ^= keys[index]
+        return h
+
+    def image_hashes(self, position):
+        '''
+        Hash the stones of the 8 symmetric images of a position.
+
+        :param position: (black, white) bitboards.
+        :return: tuple of 64-bit hashes, the k-th one is the image by Bitboard.symmetries[k].
+        '''
+        hashes = (0,) * 8
+        for piece_type in (1, 2):
+            keys = self.image_keys[piece_type]
+            for index in iter_bits(position[piece_type - 1]):
+                hashes = tuple(h ^ x for h, x in zip(hashes, keys[index]))
+        return hashes
+
+    def update(self, h, index, piece_type, captured):
+        '''
+        Update a board hash after a placement.
+
+        :param h: board hash before the placement.
+        :param index: point played.
+        :param piece_type: 1('X') or 2('O').
+        :param captured: bitboard of the opponent stones removed by the placement.
+        :return: board hash after the placement.
+        '''
+        h ^= self.stone_keys[piece_type][index]
+        if captured:
+            keys = self.stone_keys[3 - piece_type]
+            for q in iter_bits(captured):
+                h ^= keys[q]
+        return h
+
+    def key(self, board_hash, piece_type, ko_point, move, position=None, passed=False):
+        '''
+        Full search key of a position.
+
+        :param board_hash: hash of the stones.
+        :param piece_type: side to move.
+        :param ko_point: point forbidden by the KO rule, None if there is none.
+        :param move: number of moves played so far.
+        :param position: (black, white) bitboards, to share the key between symmetric positions.
+        :param passed: boolean, the opponent just passed so passing ends the game.
+        :return: (64-bit key, k) where k is the symmetry of the image the key was taken from.
+        '''
+        state = self.side_keys[piece_type] ^ self.move_keys[min(move, len(self.move_keys) - 1)]
+        if passed:
+            state ^= self.passed_key
+        if position is not None and popcount(position[0] | position[1]) <= self.symmetric_stones:
+            ko_keys = self.image_ko_keys[-1 if ko_point is None else ko_point]
+            key, k = min((h ^ ko, k) for k, (h, ko) in enumerate(zip(self.image_hashes(position), ko_keys)))
+            return key ^ state, k
+        ko = self.ko_keys[-1] if ko_point is None else self.ko_keys[ko_point]
+        return board_hash ^ ko ^ state, 0
+
+
+class TranspositionTable:
+    def __init__(self, bits=16, backing=None):
+        '''
+        Fixed-size table of search results indexed by the low bits of the Zobrist key.
+        Symmetric positions share a key, so best moves are stored in the frame of the image
+        the key was taken from (see Minimax.to_table).
+
+        Each slot keeps one entry (key, depth, value, bound, best move, generation). A new
+        result replaces the stored one when it was searched at least as deep, or when the
+        stored one is left over from an earlier search.
+
+        A backing table (e.g. cache.PositionCache) is written through and consulted on misses,
+        so results outlive the process.
+
+        :param bits: log2 of the number of slots.
+        :param backing: slower table with the same probe(), store(), new_search() and refresh() methods,
+                        None for none.
+        '''
+        self.backing = backing
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.probes = 0
+
+    def new_search(self, owner=True):
+        '''
+        Age the stored entries so the next search may overwrite them.
+
+        :param owner: boolean, this table runs the search and starts a new generation of the
+                      backing table. A table helping another process's search only re-reads it.
+        :return: None.
+        '''
+        self.generation += 1
+        if self.backing is not None:
+            if owner:
+                self.backing.new_search()
+            else:
+                self.backing.refresh()
+
+    def probe(self, key):
+        '''
+        Look up a position.
+
+        :param key: Zobrist key.
+        :return: (depth, value, bound, best move), or None if the position is not stored.
+        '''
+        self.probes += 1
+        slot = key & self.mask
+        entry = self.slots[slot]
+        if entry is None or entry[0] != key:
+            if self.backing is None:
+                return None
+            found = self.backing.probe(key)
+            if found is None:
+                return None
+            self.slots[slot] = (key,) + found + (self.generation,)
+            self.hits += 1
+            return found
+        self.hits += 1
+        return entry[1:5]
+
+    def store(self, key, depth, value, bound, best_move):
+        '''
+        Store a search result, following the depth-preferred replacement policy.
+
+        :param key: Zobrist key.
+        :param depth: remaining depth the value was searched to.
+        :param value: search value.
+        :param bound: EXACT, LOWER or UPPER.
+        :param best_move: best move found, None if there is none.
+        :return: None.
+        '''
+        slot = key & self.mask
+        entry = self.slots[slot]
+        if entry is not None and entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+            return
+        if entry is not None and entry[0] == key and best_move is None:
+            best_move = entry[4]
+        self.slots[slot] = (key, depth, value, bound, best_move, self.generation)
+        if self.backing is not None:
+            self.backing.store(key, depth, value, bound, best_move)
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.hits = 0
+        self.probes = 0